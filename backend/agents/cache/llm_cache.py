@@ -0,0 +1,65 @@
+import hashlib
+import json
+import os
+
+from cachetools import TTLCache
+
+# diskcache es opcional: si no está instalado se usa una caché en memoria acotada
+try:
+    import diskcache
+    DISKCACHE_AVAILABLE = True
+except ImportError:
+    DISKCACHE_AVAILABLE = False
+
+
+# La caché es opcional y está desactivada por defecto: el árbol de ideas debe
+# muestrear respuestas nuevas en cada ejecución. LLM_CACHE=1 la activa para
+# depurar, cuando se repite la misma ejecución
+CACHE_ENV_VAR = "LLM_CACHE"
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".llm_cache")
+CACHE_EXPIRE_SECONDS = 86400
+# Máximo de respuestas en la caché en memoria; las menos usadas se descartan
+MEMORY_CACHE_MAXSIZE = 512
+
+
+def _crear_cache():
+    if DISKCACHE_AVAILABLE:
+        return diskcache.Cache(CACHE_DIR)
+    return TTLCache(maxsize=MEMORY_CACHE_MAXSIZE, ttl=CACHE_EXPIRE_SECONDS)
+
+_cache = _crear_cache()
+
+
+def cache_activada() -> bool:
+    """True si LLM_CACHE está activada en el entorno (se lee en cada llamada, tras load_dotenv)."""
+    return os.getenv(CACHE_ENV_VAR, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def cache_key(cloud_service: str, modelo: str, system: str, human: str) -> str:
+    """Clave sha256 determinista para (servicio, modelo, system, human)."""
+    payload = json.dumps(
+        {"service": cloud_service, "model": modelo, "system": system, "human": human},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_cached(cloud_service: str, modelo: str, system: str, human: str):
+    """Devuelve la respuesta guardada para este prompt, o None si no existe."""
+    return _cache.get(cache_key(cloud_service, modelo, system, human))
+
+
+def set_cached(cloud_service: str, modelo: str, system: str, human: str, respuesta: str):
+    """Guarda una respuesta válida del LLM. Los errores no se cachean."""
+    if not isinstance(respuesta, str) or respuesta.startswith("[ERROR]"):
+        return
+    key = cache_key(cloud_service, modelo, system, human)
+    if DISKCACHE_AVAILABLE:
+        _cache.set(key, respuesta, expire=CACHE_EXPIRE_SECONDS)
+    else:
+        _cache[key] = respuesta
+
+
+def clear_cache():
+    _cache.clear()
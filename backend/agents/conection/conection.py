@@ -1,7 +1,7 @@
 from ideas_orchestator.LLM_response import obtener_respuesta
 from cloud.cloud_constants import models_dict
 from ideas_orchestator.common import elegir_modelo_aleatorio, get_random_service_key
-from prompt.prompt import system
+from prompt.prompts_compiled import SYSTEM as system
 
 
 def prompt_to_llm_engineer(final_conclusion):
@@ -1,84 +1,235 @@
-import os
-from langchain_cerebras import ChatCerebras
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_groq import ChatGroq
-from langchain_sambanova import ChatSambaNovaCloud
-from langchain_core.prompts import ChatPromptTemplate
+import asyncio
+import functools
+from typing import Optional
+from langchain_core.messages import HumanMessage, SystemMessage
 
 
-from ideas_orchestator.common import colombia_now, get_random_service_key
+from cache.llm_cache import cache_activada, get_cached, set_cached
+from ideas_orchestator.common import LLMError, colombia_now, con_reintentos, con_reintentos_async
 
-from prompt.prompt import human, system
+from prompt.prompts_compiled import HUMAN as human
 from cloud.cloud_constants import models_dict
 
 
-human_list = []
+@functools.lru_cache(maxsize=64)
+def get_chat(cloud_service: str, modelo: str, api_key: str):
+    '''Devuelve el cliente Chat de LangChain para (servicio, modelo, key).
 
-def human_variations():
-    '''Toma el contexto humano y le añade contexto sobre la hora'''
-    global human_list
+    Los clientes se construyen una sola vez por combinación y se reutilizan,
+    de modo que también se reaprovecha su sesión HTTP entre llamadas.
 
-    print(f"current time: {colombia_now()}")
+    Los SDK de cada proveedor se importan aquí, solo cuando se usan por
+    primera vez, para no cargarlos todos al arrancar.
+    '''
+    if cloud_service == "groq":
+        from langchain_groq import ChatGroq
+        return ChatGroq(model_name=modelo, groq_api_key=api_key)
+    elif cloud_service == "sambanova":
+        from langchain_sambanova import ChatSambaNovaCloud
+        return ChatSambaNovaCloud(model=modelo, sambanova_api_key=api_key, convert_system_message_to_human=True)
+    elif cloud_service == "cerebras":
+        from langchain_cerebras import ChatCerebras
+        return ChatCerebras(model=modelo, cerebras_api_key=api_key)
+    elif cloud_service == "googleaistudio":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        return ChatGoogleGenerativeAI(model=modelo, google_api_key=api_key, convert_system_message_to_human=True)
+    raise ValueError(f"Servicio '{cloud_service}' no soportado")
 
-    human_hour_context = 'Redact the following prompt with your own words: "' + human +  f' First, keep in mind that the current time is sunday {colombia_now()}, so we just have that quantity of time to create, train and test the ML model'
+def _mensajes(system: str, human: str):
+    '''Mensajes directos para el chat, sin pasar por una plantilla.
 
-    if not human_list:
-        human_list = [obtener_respuesta('groq', "", human_hour_context,  models_dict['groq'][0]) for _ in range(5)]
+    Como no hay variables que sustituir, no hace falta ChatPromptTemplate
+    ni escapar las llaves del texto.
+    '''
+    return [SystemMessage(content=system), HumanMessage(content=human)]
 
-    return human_list
+# Variaciones ya calculadas en este proceso y lock para no pedirlas dos veces
+_variaciones = None
+_variaciones_lock = None
 
-def obtener_respuesta(cloud_service: str, system: str, human: str, modelo: str) -> str:
-  
-    get_random_service_key(cloud_service)
+async def human_variations(semaforos=None):
+    '''Toma el contexto humano y le añade contexto sobre la hora.
 
-    # Escapar {error} en system y human para evitar KeyError en plantillas
-    system_safe = system.replace('{error}', '{{error}}') if '{error}' in system else system
-    human_safe = human.replace('{error}', '{{error}}') if '{error}' in human else human
+    Se calcula una sola vez por proceso: las llamadas concurrentes (varios
+    árboles a la vez) esperan a la primera y reutilizan su resultado. Si
+    alguna redacción falló y se sustituyó por el original, el resultado no
+    se guarda y la siguiente llamada vuelve a intentarlo. Las 5
+    redacciones se piden en paralelo con asyncio.gather bajo el semáforo de
+    Groq, si se pasan los semáforos por proveedor.
+    '''
+    global _variaciones, _variaciones_lock
+    # El lock se crea dentro del bucle de eventos que lo va a usar
+    if _variaciones_lock is None:
+        _variaciones_lock = asyncio.Lock()
+    async with _variaciones_lock:
+        if _variaciones is not None:
+            return _variaciones
 
-    if cloud_service == "groq":
-        result = obtener_respuesta_groq(system_safe, human_safe, modelo)
-    elif cloud_service == "sambanova":
-        result = obtener_respuesta_sambanova(system_safe, human_safe, modelo)
-    elif cloud_service == "cerebras":
-        result = obtener_respuesta_cerebras(system_safe, human_safe, modelo)
-    elif cloud_service == "googleaistudio":
-        result = obtener_respuesta_google(system_safe, human_safe, modelo)
-    else:
-        return "Servicio no soportado"
+        ahora = colombia_now()
+        print(f"current time: {ahora}")
+
+        human_hour_context = 'Redact the following prompt with your own words: "' + human +  f' First, keep in mind that the current time is sunday {ahora}, so we just have that quantity of time to create, train and test the ML model'
+
+        # Sin semáforo compartido para Groq, uno propio basta para las 5 llamadas
+        semaforo = (semaforos or {}).get('groq') or asyncio.Semaphore(5)
+
+        async def redactar():
+            try:
+                async with semaforo:
+                    return await obtener_respuesta_async('groq', "", human_hour_context, models_dict['groq'][0], usar_cache=False), True
+            except LLMError as e:
+                # Si una redacción falla se usa el prompt humano original
+                print(f"Variación del prompt fallida, se usa el original: {e}")
+                return human, False
+
+        # Sin caché: se buscan 5 redacciones distintas del mismo prompt
+        resultados = await asyncio.gather(*[redactar() for _ in range(5)])
+        variaciones = tuple(texto for texto, _ in resultados)
+        # Solo se memorizan las variaciones si todas las llamadas tuvieron éxito
+        if all(ok for _, ok in resultados):
+            _variaciones = variaciones
+        return variaciones
+
+def obtener_respuesta(cloud_service: str, system: str, human: str, modelo: str, usar_cache: Optional[bool] = None) -> str:
+    '''
+    Respuesta del LLM para (system, human), con reintentos.
 
-    # Si el resultado es un dict con 'error', devolver el mensaje de error
+    usar_cache=None sigue la variable de entorno LLM_CACHE (desactivada por
+    defecto); True o False fuerzan el uso de la caché o lo evitan.
+    '''
+    if usar_cache is None:
+        usar_cache = cache_activada()
+
+    # Un prompt idéntico ya respondido se devuelve sin llamar al LLM
+    if usar_cache:
+        cached = get_cached(cloud_service, modelo, system, human)
+        if cached is not None:
+            return cached
+
+    def llamada(api_key):
+        if cloud_service == "groq":
+            return obtener_respuesta_groq(system, human, modelo, api_key)
+        elif cloud_service == "sambanova":
+            return obtener_respuesta_sambanova(system, human, modelo, api_key)
+        elif cloud_service == "cerebras":
+            return obtener_respuesta_cerebras(system, human, modelo, api_key)
+        elif cloud_service == "googleaistudio":
+            return obtener_respuesta_google(system, human, modelo, api_key)
+        raise ValueError(f"Servicio '{cloud_service}' no soportado")
+
+    # Reintentos con backoff exponencial; en cada intento se elige otra key
+    result = con_reintentos(cloud_service, modelo, llamada)
+
+    # Si el resultado es un dict con 'error', se trata como un fallo
     if isinstance(result, dict) and 'error' in result:
-        return f"[ERROR]: {result['error']}"
+        raise LLMError(f"{cloud_service}/{modelo}: {result['error']}")
+
+    if usar_cache:
+        set_cached(cloud_service, modelo, system, human, result)
     return result
 
-def obtener_respuesta_groq(system: str, human: str, modelo: str) -> str:
+async def obtener_respuesta_async(cloud_service: str, system: str, human: str, modelo: str, usar_cache: Optional[bool] = None) -> str:
+    """
+    Versión asíncrona de obtener_respuesta. Usa ainvoke() de LangChain para que
+    varias llamadas puedan ejecutarse en paralelo con asyncio.gather.
+    """
+    if usar_cache is None:
+        usar_cache = cache_activada()
+
+    # Un prompt idéntico ya respondido se devuelve sin llamar al LLM
+    if usar_cache:
+        cached = get_cached(cloud_service, modelo, system, human)
+        if cached is not None:
+            return cached
+
+    async def llamada(api_key):
+        if cloud_service == "groq":
+            return await obtener_respuesta_groq_async(system, human, modelo, api_key)
+        elif cloud_service == "sambanova":
+            return await obtener_respuesta_sambanova_async(system, human, modelo, api_key)
+        elif cloud_service == "cerebras":
+            return await obtener_respuesta_cerebras_async(system, human, modelo, api_key)
+        elif cloud_service == "googleaistudio":
+            return await obtener_respuesta_google_async(system, human, modelo, api_key)
+        raise ValueError(f"Servicio '{cloud_service}' no soportado")
+
+    # Reintentos con backoff exponencial; en cada intento se elige otra key
+    result = await con_reintentos_async(cloud_service, modelo, llamada)
+
+    # Si el resultado es un dict con 'error', se trata como un fallo
+    if isinstance(result, dict) and 'error' in result:
+        raise LLMError(f"{cloud_service}/{modelo}: {result['error']}")
+
+    if usar_cache:
+        set_cached(cloud_service, modelo, system, human, result)
+    return result
+
+# Marcadores con los que el juez cierra su veredicto
+MARCADORES_VEREDICTO = ("VEREDICTO FINAL:",)
+MIN_LEN_VEREDICTO = 200
+
+def _veredicto_completo(buffer: str, stop_markers, min_len: int) -> bool:
+    '''True cuando algún marcador ya apareció y su línea está terminada.'''
+    if len(buffer) <= min_len:
+        return False
+    for marcador in stop_markers:
+        pos = buffer.find(marcador)
+        if pos != -1 and "\n" in buffer[pos + len(marcador):]:
+            return True
+    return False
+
+async def obtener_respuesta_streaming_async(cloud_service: str, system: str, human: str, modelo: str,
+                                            stop_markers=MARCADORES_VEREDICTO, min_len: int = MIN_LEN_VEREDICTO,
+                                            usar_cache: Optional[bool] = None) -> str:
+    """
+    Igual que obtener_respuesta_async, pero recibe la respuesta con
+    chat.astream() y corta la generación en cuanto se completa la línea del
+    marcador de veredicto, sin esperar (ni pagar) el resto de tokens.
+    """
+    if usar_cache is None:
+        usar_cache = cache_activada()
+
+    if usar_cache:
+        cached = get_cached(cloud_service, modelo, system, human)
+        if cached is not None:
+            return cached
+
+    async def llamada(api_key):
+        chat = get_chat(cloud_service, modelo, api_key)
+        buffer = ""
+        async for chunk in chat.astream(_mensajes(system, human)):
+            buffer += chunk.content
+            if _veredicto_completo(buffer, stop_markers, min_len):
+                break
+        return buffer
+
+    buffer = await con_reintentos_async(cloud_service, modelo, llamada)
+
+    if usar_cache:
+        set_cached(cloud_service, modelo, system, human, buffer)
+    return buffer
+
+def obtener_respuesta_groq(system: str, human: str, modelo: str, api_key: str) -> str:
     """
     Obtiene una respuesta de un modelo de lenguaje de Groq dado un texto de entrada.
 
     Args:
         texto_entrada: El texto de entrada para el modelo de lenguaje.
+        api_key: La API key de Groq con la que se construye el cliente.
 
     Returns:
         La respuesta generada por el modelo de lenguaje.
     """
-    try:
-        if "GROQ_API_KEY" not in os.environ:
-            return "[ERROR]: Falta la variable de entorno GROQ_API_KEY"
-
-        chat = ChatGroq(model_name=modelo)
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", system),
-            ("human", human)
-        ])
-        chain = prompt | chat
-        respuesta = chain.invoke({"system": system, "human": human})
-        return respuesta.content
-    except Exception as e:
-        return f"[ERROR]: {e}"
+    if not api_key:
+        raise LLMError("Falta la API key de Groq")
+
+    chat = get_chat("groq", modelo, api_key)
+    respuesta = chat.invoke(_mensajes(system, human))
+    return respuesta.content
 
 # Crear otras 3 funciones con las cuales podamos obtener una respuesta utilizando la libreria langchain de cada uno de los servicios cloud
 
-def obtener_respuesta_sambanova(system: str, human: str, modelo: str) -> str:
+def obtener_respuesta_sambanova(system: str, human: str, modelo: str, api_key: str) -> str:
     """
     Obtiene una respuesta de un modelo de Google AI Studio (Gemini) usando LangChain.
 
@@ -86,32 +237,23 @@ def obtener_respuesta_sambanova(system: str, human: str, modelo: str) -> str:
         system: La instrucción o contexto para el modelo (rol del sistema).
         human: La pregunta o entrada del usuario.
         modelo: El nombre del modelo a utilizar (ej. "gemini-1.5-pro-latest").
+        api_key: La API key del servicio con la que se construye el cliente.
 
     Returns:
         La respuesta generada por el modelo como una cadena de texto.
     """
 
-    chat = ChatSambaNovaCloud(model=modelo, convert_system_message_to_human=True)
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", system),
-        ("human", human)
-    ])
-    chain = prompt | chat
-    respuesta = chain.invoke({"system": system, "human": human})
+    chat = get_chat("sambanova", modelo, api_key)
+    respuesta = chat.invoke(_mensajes(system, human))
     return respuesta.content
 
-def obtener_respuesta_cerebras(system: str, human: str, modelo: str) -> str:
-    chat = ChatCerebras(model=modelo)
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", system),
-        ("human", human)
-    ])
-    chain = prompt | chat
-    respuesta = chain.invoke({"system": system, "human": human})
+def obtener_respuesta_cerebras(system: str, human: str, modelo: str, api_key: str) -> str:
+    chat = get_chat("cerebras", modelo, api_key)
+    respuesta = chat.invoke(_mensajes(system, human))
     return respuesta.content
 
 
-def obtener_respuesta_google(system: str, human: str, modelo: str) -> str:
+def obtener_respuesta_google(system: str, human: str, modelo: str, api_key: str) -> str:
     """
     Obtiene una respuesta de un modelo de Google AI Studio (Gemini) usando LangChain.
 
@@ -119,16 +261,38 @@ def obtener_respuesta_google(system: str, human: str, modelo: str) -> str:
         system: La instrucción o contexto para el modelo (rol del sistema).
         human: La pregunta o entrada del usuario.
         modelo: El nombre del modelo a utilizar (ej. "gemini-1.5-pro-latest").
+        api_key: La API key del servicio con la que se construye el cliente.
 
     Returns:
         La respuesta generada por el modelo como una cadena de texto.
     """
 
-    chat = ChatGoogleGenerativeAI(model=modelo, convert_system_message_to_human=True)
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", system),
-        ("human", human)
-    ])
-    chain = prompt | chat
-    respuesta = chain.invoke({"system": system, "human": human})
-    return respuesta.content
\ No newline at end of file
+    chat = get_chat("googleaistudio", modelo, api_key)
+    respuesta = chat.invoke(_mensajes(system, human))
+    return respuesta.content
+
+
+# Versiones asíncronas (ainvoke) de las funciones anteriores
+
+async def obtener_respuesta_groq_async(system: str, human: str, modelo: str, api_key: str) -> str:
+    if not api_key:
+        raise LLMError("Falta la API key de Groq")
+
+    chat = get_chat("groq", modelo, api_key)
+    respuesta = await chat.ainvoke(_mensajes(system, human))
+    return respuesta.content
+
+async def obtener_respuesta_sambanova_async(system: str, human: str, modelo: str, api_key: str) -> str:
+    chat = get_chat("sambanova", modelo, api_key)
+    respuesta = await chat.ainvoke(_mensajes(system, human))
+    return respuesta.content
+
+async def obtener_respuesta_cerebras_async(system: str, human: str, modelo: str, api_key: str) -> str:
+    chat = get_chat("cerebras", modelo, api_key)
+    respuesta = await chat.ainvoke(_mensajes(system, human))
+    return respuesta.content
+
+async def obtener_respuesta_google_async(system: str, human: str, modelo: str, api_key: str) -> str:
+    chat = get_chat("googleaistudio", modelo, api_key)
+    respuesta = await chat.ainvoke(_mensajes(system, human))
+    return respuesta.content
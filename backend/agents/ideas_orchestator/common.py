@@ -1,48 +1,165 @@
+import asyncio
+from collections import Counter
 from datetime import datetime
-import os
 import random
+import threading
+import time
+from zoneinfo import ZoneInfo
 
-import pytz
 from cloud.cloud_constants import api_keys
 
+# Zona horaria de Colombia, resuelta una sola vez
+_TZ = ZoneInfo('America/Bogota')
+
 def colombia_now():
-    # Define the time zone for Colombia (e.g., America/Bogota)
-    colombia_timezone = pytz.timezone('America/Bogota')
+    return datetime.now(_TZ).strftime('%Y-%m-%d %H:%M:%S %Z%z')
 
-    # Get the current UTC time
-    utc_now = datetime.utcnow()
+RETRY_AFTER_POR_DEFECTO = 60.0
 
-    # Localize the UTC time to the Colombia time zone
-    colombia_now = pytz.utc.localize(utc_now).astimezone(colombia_timezone).strftime('%Y-%m-%d %H:%M:%S %Z%z')
-    return colombia_now
+class LLMError(Exception):
+    """Fallo definitivo de una llamada al LLM, tras agotar los reintentos."""
 
-def get_random_service_key(service_name):
-        """Return a random API key for the given service."""
-        if service_name not in api_keys:
-            raise ValueError(f"Servicio '{service_name}' no encontrado. Los servicios disponibles son: {list(api_keys.keys())}")
+class ApiKeyManager:
+    """
+    Reparte las API keys de cada servicio en lugar de usar random.choice.
 
-        keys_for_service = api_keys[service_name]
-        if not keys_for_service:
-            raise ValueError(f"No se encontraron API keys para el servicio '{service_name}'.")
+    Se elige la key con menos peticiones y, a igualdad, la usada hace más
+    tiempo. Una key que recibe un rate limit (429) queda en cuarentena durante
+    `retry_after` segundos y no se elige mientras haya otras disponibles.
+    """
+
+    def __init__(self, keys_por_servicio):
+        self._keys = {servicio: list(keys) for servicio, keys in keys_por_servicio.items()}
+        self._usos = {servicio: Counter() for servicio in self._keys}
+        self._ultimo_uso = {servicio: {} for servicio in self._keys}
+        self._cuarentena = {servicio: {} for servicio in self._keys}
+        self._lock = threading.Lock()
+
+    def services(self):
+        return list(self._keys.keys())
+
+    def keys(self, service):
+        return self._keys.get(service, [])
+
+    def pick(self, service):
+        """Devuelve la key menos usada (y menos reciente) del servicio."""
+        keys = self._keys[service]
+        with self._lock:
+            ahora = time.monotonic()
+            cuarentena = self._cuarentena[service]
+            disponibles = [k for k in keys if cuarentena.get(k, 0.0) <= ahora]
+            if not disponibles:
+                # Todas en cuarentena: usar la que sale antes de ella
+                disponibles = [min(keys, key=lambda k: cuarentena[k])]
+
+            usos = self._usos[service]
+            ultimo_uso = self._ultimo_uso[service]
+            key = min(disponibles, key=lambda k: (usos[k], ultimo_uso.get(k, 0.0)))
+
+            usos[key] += 1
+            ultimo_uso[key] = ahora
+            return key
+
+    def penalize(self, service, key, retry_after=RETRY_AFTER_POR_DEFECTO):
+        """Marca una key que devolvió un rate limit y la aparta `retry_after` segundos."""
+        if service not in self._keys:
+            return
+        with self._lock:
+            self._usos[service][key] += 1
+            self._cuarentena[service][key] = time.monotonic() + retry_after
+
+
+def es_rate_limit(error):
+    """Indica si una excepción de un cliente Chat corresponde a un rate limit (429)."""
+    if getattr(error, "status_code", None) == 429:
+        return True
+    texto = str(error).lower()
+    return "429" in texto or "rate limit" in texto or "rate_limit" in texto
+
+
+def es_reintentable(error):
+    """Errores transitorios (rate limit, timeout, 5xx) que merece la pena reintentar."""
+    if es_rate_limit(error):
+        return True
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int) and status >= 500:
+        return True
+    return isinstance(error, TimeoutError) or "timeout" in type(error).__name__.lower()
+
+
+MAX_INTENTOS = 4
+ESPERA_INICIAL = 1.0
+ESPERA_MAXIMA = 30.0
+
+def espera_backoff(intento):
+    """Segundos a esperar antes del reintento `intento` (backoff exponencial con jitter)."""
+    return min(ESPERA_MAXIMA, ESPERA_INICIAL * 2 ** intento) + random.uniform(0, ESPERA_INICIAL)
 
-        key = random.choice(keys_for_service)
 
-        if service_name == "groq":
-            os.environ["GROQ_API_KEY"] = key
-        elif service_name == "sambanova":
-            os.environ["SAMBANOVA_API_KEY"] = key
-        elif service_name == "cerebras":
-            os.environ["CEREBRAS_API_KEY"] = key
-        elif service_name == "googleaistudio":
-            os.environ["GOOGLE_API_KEY"] = key
+# Gestor único de keys, construido una sola vez al importar el módulo.
+# Las keys se pasan explícitamente a los clientes Chat, sin tocar os.environ.
+key_manager = ApiKeyManager(api_keys)
+
+def get_random_service_key(service_name=None):
+        """Return (service, key) with the next API key to use for the given service.
+
+        Without a service name, a random service that has keys is chosen.
+        """
+        if service_name is None:
+            servicios_con_keys = [s for s in key_manager.services() if key_manager.keys(s)]
+            if not servicios_con_keys:
+                raise ValueError("No API keys loaded.")
+            service_name = random.choice(servicios_con_keys)
+
+        if service_name not in key_manager.services():
+            raise ValueError(f"Servicio '{service_name}' no encontrado. Los servicios disponibles son: {key_manager.services()}")
+
+        if not key_manager.keys(service_name):
+            raise ValueError(f"No se encontraron API keys para el servicio '{service_name}'.")
+
+        key = key_manager.pick(service_name)
 
         return service_name, key
 
-def elegir_modelo_aleatorio(models_dict):
-        proveedor_elegido = random.choice(list(models_dict.keys()))
 
-        modelos_del_proveedor = models_dict[proveedor_elegido]
+# La política de reintentos vive en un solo sitio: cada llamada cambia de key,
+# aparta las que devuelven un rate limit y espera con backoff entre intentos
+
+def con_reintentos(cloud_service, modelo, llamada):
+    """Ejecuta `llamada(api_key)` con reintentos; agotados, lanza LLMError."""
+    for intento in range(MAX_INTENTOS):
+        _, api_key = get_random_service_key(cloud_service)
+        try:
+            return llamada(api_key)
+        except Exception as e:
+            _tras_fallo(cloud_service, modelo, api_key, intento, e)
+            time.sleep(espera_backoff(intento))
+
+
+async def con_reintentos_async(cloud_service, modelo, llamada):
+    """Versión asíncrona de con_reintentos: `llamada(api_key)` devuelve un awaitable."""
+    for intento in range(MAX_INTENTOS):
+        _, api_key = get_random_service_key(cloud_service)
+        try:
+            return await llamada(api_key)
+        except Exception as e:
+            _tras_fallo(cloud_service, modelo, api_key, intento, e)
+            await asyncio.sleep(espera_backoff(intento))
+
+
+def _tras_fallo(cloud_service, modelo, api_key, intento, error):
+    """Penaliza la key si hubo rate limit y relanza como LLMError si no se reintenta."""
+    if es_rate_limit(error):
+        key_manager.penalize(cloud_service, api_key)
+    if not es_reintentable(error) or intento == MAX_INTENTOS - 1:
+        raise LLMError(f"{cloud_service}/{modelo}: {error}") from error
+
+
+def elegir_modelo_aleatorio(models_dict):
+        # Se elige sobre el diccionario recibido en cada llamada, así una copia
+        # o un cambio en caliente de models_dict se respetan
+        proveedor_elegido = random.choice(tuple(models_dict))
 
-        modelo_elegido = random.choice(modelos_del_proveedor)
+        modelo_elegido = random.choice(models_dict[proveedor_elegido])
 
         return proveedor_elegido, modelo_elegido
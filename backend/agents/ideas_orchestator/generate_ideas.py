@@ -1,23 +1,16 @@
 '''DEPENDENCIAS'''
 
 
+import asyncio
 import os
 from dotenv import load_dotenv
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_sambanova import ChatSambaNovaCloud
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_cerebras import ChatCerebras
-from langchain_groq import ChatGroq
-from langchain_google_genai import ChatGoogleGenerativeAI # Added import
 from datetime import datetime
 from cloud.cloud_constants import models_dict, api_keys
-import pytz
 import random
 import time
 
-from ideas_orchestator.LLM_response import human_variations, obtener_respuesta
-from ideas_orchestator.common import elegir_modelo_aleatorio
-from ideas_orchestator.utils import get_random_service_key
+from ideas_orchestator.LLM_response import human_variations, obtener_respuesta_async, obtener_respuesta_streaming_async
+from ideas_orchestator.common import LLMError, elegir_modelo_aleatorio, get_random_service_key
 from intercept_prints import *
 from intercept_prints.intercept_prints import intercept_prints, procesar_print
 
@@ -37,14 +30,36 @@ api_keys = {
 
 '''MODELS'''
 
-with open("SYSTEM.TXT", "r", encoding="utf-8") as f:
-    system = f.read()
+# Prompts precompilados desde los .txt (ver prompt/compile_prompts.py)
+from prompt.prompts_compiled import SYSTEM as system, HUMAN as human, PROMPT_JUICIO as prompt_juicio
 
-with open("HUMAN.TXT", "r", encoding="utf-8") as f:
-    human = f.read()
+# Plantillas constantes: se formatean en cada llamada con str.format
+PROMPT_REFINAMIENTO = """
+            Toma la siguiente idea y mejórala. Hazla más innovadora, más específica sobre el MVP
+            y con más potencial para convertirse en un modelo SOTA (State-Of-The-Art).
+            No te limites a repetir, debes añadir valor y evolucionar el concepto.
 
-with open("PROMPT_JUICIO.TXT", "r", encoding="utf-8") as f:
-    prompt_juicio = f.read()
+            IDEA A REFINAR:
+            ---
+            {idea}
+            ---   
+            """
+
+PROMPT_METAJUICIO = """
+    Eres un estratega experto y supervisor de un panel de jueces de IA.
+    Tu tarea es analizar los siguientes {N_JUICIOS} veredictos emitidos por diferentes jueces de IA sobre un conjunto de ideas para el NASA Space Apps Challenge.
+    Cada juez ha analizado las mismas ideas subyacentes, pero puede haber llegado a conclusiones diferentes.
+
+    Tu objetivo es sintetizar estos análisis para emitir una recomendación final y definitiva. No te limites a elegir un veredicto; en su lugar:
+    1.  **Encuentra el Consenso**: Identifica qué ideas son consistentemente elogiadas en múltiples veredictos.
+    2.  **Evalúa los Argumentos**: Determina qué juez presenta los argumentos más sólidos, lógicos y alineados con los criterios de innovación, viabilidad y potencial.
+    3.  **Resuelve Contradicciones**: Si los jueces no están de acuerdo, analiza sus razonamientos y decide cuál es más convincente.
+    4.  **Emite el Meta-Veredicto**: Proporciona un veredicto final que resuma los hallazgos y declare cuál es la idea ganadora definitiva, explicando por qué, basándote en la síntesis de los análisis proporcionados.
+    5.  **Cierra con el Veredicto**: Termina tu respuesta con una única línea que empiece por "VEREDICTO FINAL:" seguida de la idea ganadora.
+
+    Aquí están los veredictos a analizar:
+    {veredictos}
+    """
 
 
 load_dotenv()
@@ -54,27 +69,57 @@ service, key = get_random_service_key()
 print(f"Selected service: {service}\nAPI key: {key}")
 
 
+# Máximo de llamadas simultáneas por proveedor, para no superar sus límites de RPM
+LIMITE_CONCURRENCIA_POR_PROVEEDOR = 4
+
+# Juez fijo de los veredictos; las variaciones del prompt humano usan Groq
+PROVEEDOR_JUEZ, MODELO_JUEZ = "googleaistudio", "gemini-2.5-pro"
+PROVEEDOR_VARIACIONES = "groq"
+
+def crear_semaforos(models_dict, limite=LIMITE_CONCURRENCIA_POR_PROVEEDOR,
+                    extra=(PROVEEDOR_JUEZ, PROVEEDOR_VARIACIONES)):
+    """
+    Crea un asyncio.Semaphore por proveedor de models_dict y por cada proveedor
+    de `extra`, que se usan aunque no estén en models_dict (juez y variaciones).
+    """
+    return {proveedor: asyncio.Semaphore(limite) for proveedor in (*models_dict, *extra)}
+
+
 # --- Nueva Función: Árbol de Búsqueda de Ideas ---
 
-def arbol_busqueda_ideas(models_dict, system, X, Y):
+async def arbol_busqueda_ideas(models_dict, system, X, Y, semaforos=None):
     """
     Realiza un árbol de búsqueda para generar y refinar ideas de IA.
 
+    Las X ramas son independientes entre sí, así que se ejecutan en paralelo con
+    asyncio.gather; los Y refinamientos de cada rama siguen siendo secuenciales
+    porque cada uno parte de la respuesta anterior.
+
     Args:
         models_dict (dict): Diccionario con los modelos de IA disponibles.
         system (str): El prompt de sistema.
         human (str): El prompt humano inicial.
         X (int): Número de ideas iniciales a generar (ramas del árbol).
         Y (int): Número de refinamientos por cada idea.
+        semaforos (dict, opcional): Semáforos por proveedor compartidos entre
+            varios árboles; si no se pasan se crean para este árbol.
     """
     print("*"*20)
     print("INICIANDO PROCESO DE ÁRBOL DE BÚSQUEDA DE IDEAS")
     print("*"*20 + "\n")
 
-    ideas_refinadas_finales = []
+    if semaforos is None:
+        semaforos = crear_semaforos(models_dict)
 
-    # --- PASO 1: Generación de X ideas iniciales ---
-    for i in range(X):
+    async def llamar(cloud, system, human, model):
+        async with semaforos[cloud]:
+            return await obtener_respuesta_async(cloud, system, human, model)
+
+    # Las variaciones del prompt humano se obtienen una vez, fuera de las ramas
+    variaciones = await human_variations(semaforos)
+
+    async def run_branch(i):
+        # --- PASO 1: Generación de la idea inicial de la rama ---
         print(f"\n--- [RAMA {i+1}/{X}] Iniciando generación de idea ---")
         # Esta parte se asume que funciona correctamente
         cloud, model = elegir_modelo_aleatorio(models_dict)
@@ -82,7 +127,12 @@ def arbol_busqueda_ideas(models_dict, system, X, Y):
 
 #AQUÍ SE RANDOMIZA EL HUMAN 
         
-        idea_actual = obtener_respuesta(cloud, system, random.choice(human_variations()), model)
+        try:
+            idea_actual = await llamar(cloud, system, random.choice(variaciones), model)
+        except LLMError as e:
+            # Sin idea inicial no hay nada que refinar: la rama termina aquí
+            print(f"--- [RAMA {i+1}/{X}] Falló la generación de la idea ({e}). Rama descartada. ---\n")
+            return None
         print(f"\nIDEA INICIAL {i+1}:\n'{idea_actual}'\n")
 
         # Para simular el proceso sin ejecutar el modelo real:
@@ -90,30 +140,33 @@ def arbol_busqueda_ideas(models_dict, system, X, Y):
         # print(f"\nIDEA INICIAL {i+1}:\n'{idea_actual}'\n")
 
 
-        # --- PASO 2: Refinamiento de cada idea Y veces ---
+        # --- PASO 2: Refinamiento de la idea Y veces ---
         for j in range(Y):
             print(f"--- [RAMA {i+1}/{X}] Refinamiento {j+1}/{Y} ---")
             cloud_ref, model_ref = elegir_modelo_aleatorio(models_dict)
             print(f"Seleccionado para refinar: {cloud_ref}/{model_ref}")
 
-            prompt_refinamiento = f"""
-            Toma la siguiente idea y mejórala. Hazla más innovadora, más específica sobre el MVP
-            y con más potencial para convertirse en un modelo SOTA (State-Of-The-Art).
-            No te limites a repetir, debes añadir valor y evolucionar el concepto.
-
-            IDEA A REFINAR:
-            ---
-            {idea_actual}
-            ---   
-            """
-            idea_actual = obtener_respuesta(cloud_ref, system, prompt_refinamiento, model_ref)
+            prompt_refinamiento = PROMPT_REFINAMIENTO.format(idea=idea_actual)
+            try:
+                idea_actual = await llamar(cloud_ref, system, prompt_refinamiento, model_ref)
+            except LLMError as e:
+                # Se conserva la última idea válida; el siguiente refinamiento elige otro modelo
+                print(f"Refinamiento {j+1} fallido ({e}). Se mantiene la idea anterior.")
+                continue
 
             # Simulación del refinamiento:
             # idea_actual += f" (refinada {j+1} vez)"
             print(f"\nIDEA REFINADA {j+1}:\n'{idea_actual}'\n")
 
-        ideas_refinadas_finales.append(idea_actual)
         print(f"--- [RAMA {i+1}/{X}] Fin de la rama. La idea final ha sido guardada. ---\n")
+        return idea_actual
+
+    # Las ramas se lanzan a la vez; gather conserva el orden de las ideas
+    ideas_refinadas = await asyncio.gather(*[run_branch(i) for i in range(X)])
+    # Las ramas descartadas (None) no llegan al juez
+    ideas_refinadas_finales = [idea for idea in ideas_refinadas if idea is not None]
+    if not ideas_refinadas_finales:
+        raise LLMError("Ninguna rama del árbol pudo generar una idea")
 
     # --- PASO 3: Juicio y análisis final de todas las ideas refinadas ---
     print("\n" + "*"*20)
@@ -132,14 +185,16 @@ def arbol_busqueda_ideas(models_dict, system, X, Y):
 
 
     print("Seleccionando un modelo aleatorio para el juicio final...")
-    cloud_juez, model_juez = "googleaistudio", "gemini-2.5-pro" #elegir_modelo_aleatorio(models_dict)
+    cloud_juez, model_juez = PROVEEDOR_JUEZ, MODELO_JUEZ #elegir_modelo_aleatorio(models_dict)
     print(f"El JUEZ será: {cloud_juez}/{model_juez}")
 
 
 
     # Formatear el prompt_juicio con los valores correctos
-    prompt_juicio_formatted = prompt_juicio.format(X=X, ideas_to_evaluate=ideas_para_juzgar)
-    analisis_final = obtener_respuesta(cloud_juez, system, prompt_juicio_formatted, model_juez)
+    prompt_juicio_formatted = prompt_juicio.format(X=len(ideas_refinadas_finales), ideas_to_evaluate=ideas_para_juzgar)
+    # El veredicto se recibe en streaming y se corta tras la línea "VEREDICTO FINAL:"
+    async with semaforos[cloud_juez]:
+        analisis_final = await obtener_respuesta_streaming_async(cloud_juez, system, prompt_juicio_formatted, model_juez)
 
     print("\n" + "="*20)
     print("VEREDICTO FINAL DEL JUEZ")
@@ -149,11 +204,14 @@ def arbol_busqueda_ideas(models_dict, system, X, Y):
     return analisis_final
 
 #@intercept_prints(procesar_print)
-def proceso_de_metajuicio(models_dict, system, X, Y, N_JUICIOS):
+async def proceso_de_metajuicio(models_dict, system, X, Y, N_JUICIOS):
     """
     Ejecuta el proceso de árbol de búsqueda N veces y luego realiza un
     meta-juicio sobre los veredictos para obtener una conclusión de mayor calidad.
 
+    Los N árboles son independientes y se lanzan en paralelo; comparten los
+    semáforos por proveedor para respetar los límites de cada API.
+
     Args:
         models_dict (dict): Diccionario con los modelos de IA disponibles.
         system (str): El prompt de sistema.
@@ -167,14 +225,16 @@ def proceso_de_metajuicio(models_dict, system, X, Y, N_JUICIOS):
     print(f"### Se ejecutarán {N_JUICIOS} procesos de juicio completos. ###")
     print("#"*40 + "\n")
 
-    lista_de_veredictos = []
+    semaforos = crear_semaforos(models_dict)
 
-    # --- PASO 1: Ejecutar el proceso N veces y recoger los veredictos ---
-    for n in range(N_JUICIOS):
+    async def meta_proceso(n):
         print(f"\n--- [META-PROCESO {n+1}/{N_JUICIOS}] ---")
-        veredicto_individual = arbol_busqueda_ideas(models_dict, system, X, Y)
-        lista_de_veredictos.append(veredicto_individual)
+        veredicto_individual = await arbol_busqueda_ideas(models_dict, system, X, Y, semaforos)
         print(f"--- [FIN DEL META-PROCESO {n+1}/{N_JUICIOS}] ---\n")
+        return veredicto_individual
+
+    # --- PASO 1: Ejecutar el proceso N veces y recoger los veredictos ---
+    lista_de_veredictos = await asyncio.gather(*[meta_proceso(n) for n in range(N_JUICIOS)])
 
     # --- PASO 2: Realizar el meta-juicio final ---
     print("\n" + "#"*40)
@@ -187,27 +247,15 @@ def proceso_de_metajuicio(models_dict, system, X, Y, N_JUICIOS):
     for idx, veredicto in enumerate(lista_de_veredictos):
         veredictos_para_juzgar += f"--- VEREDICTO DEL JUEZ {idx+1} ---\n{veredicto}\n\n"
 
-    prompt_metajuicio = f"""
-    Eres un estratega experto y supervisor de un panel de jueces de IA.
-    Tu tarea es analizar los siguientes {N_JUICIOS} veredictos emitidos por diferentes jueces de IA sobre un conjunto de ideas para el NASA Space Apps Challenge.
-    Cada juez ha analizado las mismas ideas subyacentes, pero puede haber llegado a conclusiones diferentes.
-
-    Tu objetivo es sintetizar estos análisis para emitir una recomendación final y definitiva. No te limites a elegir un veredicto; en su lugar:
-    1.  **Encuentra el Consenso**: Identifica qué ideas son consistentemente elogiadas en múltiples veredictos.
-    2.  **Evalúa los Argumentos**: Determina qué juez presenta los argumentos más sólidos, lógicos y alineados con los criterios de innovación, viabilidad y potencial.
-    3.  **Resuelve Contradicciones**: Si los jueces no están de acuerdo, analiza sus razonamientos y decide cuál es más convincente.
-    4.  **Emite el Meta-Veredicto**: Proporciona un veredicto final que resuma los hallazgos y declare cuál es la idea ganadora definitiva, explicando por qué, basándote en la síntesis de los análisis proporcionados.
-
-    Aquí están los veredictos a analizar:
-    {veredictos_para_juzgar}
-    """
+    prompt_metajuicio = PROMPT_METAJUICIO.format(N_JUICIOS=N_JUICIOS, veredictos=veredictos_para_juzgar)
 
     print("Seleccionando un modelo aleatorio para el META-JUICIO FINAL...")
-    cloud_juez, model_juez = "googleaistudio", "gemini-2.5-pro" # elegir_modelo_aleatorio(models_dict)
+    cloud_juez, model_juez = PROVEEDOR_JUEZ, MODELO_JUEZ # elegir_modelo_aleatorio(models_dict)
     print(f"El META-JUEZ será: {cloud_juez}/{model_juez}")
 
     # Llamada final para obtener el meta-veredicto
-    meta_veredicto_final = obtener_respuesta(cloud_juez, system, prompt_metajuicio, model_juez)
+    async with semaforos[cloud_juez]:
+        meta_veredicto_final = await obtener_respuesta_streaming_async(cloud_juez, system, prompt_metajuicio, model_juez)
 
     print("\n" + "!"*20)
     print("!!! META-VEREDICTO FINAL !!!")
@@ -1,35 +1,73 @@
+import contextlib
 import sys
-from io import StringIO
+
+
+class PrintInterceptor:
+    """
+    Reenvía lo que se imprime al stdout original y llama a `callback` una vez
+    por línea completa (print escribe el texto y el salto de línea por separado).
+    """
+
+    __slots__ = ('_callback', '_out', '_pendiente', '_en_callback')
+
+    def __init__(self, callback, original_stdout):
+        self._callback = callback
+        self._out = original_stdout
+        self._pendiente = []
+        self._en_callback = False
+
+    def write(self, text):
+        # Lo que imprima el propio callback va directo al stdout original
+        if self._en_callback:
+            return self._out.write(text)
+
+        # También escribir a stdout original si quieres mantener el print visible
+        escrito = self._out.write(text)
+
+        self._pendiente.append(text)
+        if '\n' in text:
+            *lineas, resto = ''.join(self._pendiente).split('\n')
+            self._pendiente = [resto] if resto else []
+            self._despachar(lineas)
+        return escrito
+
+    def flush(self):
+        # Entregar lo que quede sin salto de línea final
+        if self._pendiente:
+            resto = ''.join(self._pendiente)
+            self._pendiente = []
+            self._despachar([resto])
+        self._out.flush()
+
+    def _despachar(self, lineas):
+        self._en_callback = True
+        try:
+            for linea in lineas:
+                # Ignorar líneas vacías
+                if linea:
+                    self._callback(linea)
+        finally:
+            self._en_callback = False
+
+    def __getattr__(self, name):
+        # encoding, isatty, fileno... se toman del stdout original
+        return getattr(self._out, name)
+
 
 def intercept_prints(callback_function):
-    """Decorador que intercepta prints y ejecuta una función con cada uno"""
+    """Decorador que intercepta prints y ejecuta una función con cada línea impresa"""
     def decorator(func):
         def wrapper(*args, **kwargs):
-            # Guardar stdout original
-            original_stdout = sys.stdout
-            
-            class PrintInterceptor(StringIO):
-                def write(self, text):
-                    # Ignorar strings vacíos y solo newlines
-                    if text and text != '\n':
-                        callback_function(text)
-                    # También escribir a stdout original si quieres mantener el print visible
-                    original_stdout.write(text)
-                    return len(text)
-            
-            # Reemplazar stdout temporalmente
-            sys.stdout = PrintInterceptor()
-            
-            try:
-                result = func(*args, **kwargs)
-            finally:
-                # Restaurar stdout original
-                sys.stdout = original_stdout
-            
-            return result
+            interceptor = PrintInterceptor(callback_function, sys.stdout)
+            # redirect_stdout restaura el stdout original incluso si func lanza una excepción
+            with contextlib.redirect_stdout(interceptor):
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    interceptor.flush()
         return wrapper
     return decorator
 
 # Función que procesa cada print
 def procesar_print(texto):
-    print(f"[INTERCEPTADO] {texto}")
\ No newline at end of file
+    print(f"[INTERCEPTADO] {texto}")
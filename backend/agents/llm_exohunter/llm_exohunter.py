@@ -1,14 +1,25 @@
+import asyncio
+import functools
 import os
-import random
 import sys
-from langchain.agents import AgentExecutor, create_structured_chat_agent
+from langchain.agents import AgentExecutor
+from langchain.agents.format_scratchpad import format_log_to_str
+from langchain.agents.output_parsers import JSONAgentOutputParser
 from langchain_groq import ChatGroq
+from langchain_core.agents import AgentAction
+from langchain_core.exceptions import OutputParserException
+from langchain_core.messages import SystemMessage
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+from langchain_core.utils.json import parse_json_markdown
+from langchain_core.tools import render_text_description_and_args
 from langchain_experimental.tools import PythonREPLTool
 
+from ideas_orchestator.common import get_random_service_key
 # Importar desde el archivo de herramientas final y estable
-from llm_tools import (
+from llm_exohunter.llm_tools import (
     GetLabeledExoplanetDatasetTool,
+    GetStarLightCurvesBatchTool,
     GetStarLightCurveTool,
     ListConfirmedExoplanetHostsTool,
     ListStarsByMissionTool
@@ -27,7 +38,10 @@ Tu ciclo de trabajo es: Thought -> Action -> Observation.
 1.  **Thought:** Describe tu plan para el siguiente paso.
 2.  **Action:** Responde con un único bloque de código JSON con una de las siguientes acciones: {tool_names}.
 3.  Después de recibir una `Observation` de una herramienta, tu siguiente respuesta DEBE empezar INMEDIATAMENTE con `Thought:` o con `Final Answer:`.
-4.  **REGLA FINAL:** Cuando hayas completado TODAS las tareas solicitadas por el usuario y verificado tu trabajo, tu respuesta final NO debe ser un JSON. Debe empezar directamente con la frase `Final Answer:` seguida de tu resumen completo.
+4.  Si necesitas varias herramientas cuyos resultados no dependen entre sí (por ejemplo, descargar las curvas de luz de varias estrellas), puedes responder con una lista JSON de acciones; se ejecutarán en paralelo.
+5.  Para descargar muchas curvas de luz usa `get_star_light_curves_batch_to_files` con la lista completa de estrellas en una sola acción, en lugar de llamar a `get_star_light_curve_to_file` una vez por estrella.
+6.  Para leer en la herramienta de Python un archivo devuelto por otra herramienta usa `from llm_exohunter.llm_tools import leer_resultado` y `leer_resultado(ruta_o_handle)`: devuelve el DataFrame desde memoria si sigue disponible, sin volver a leer el archivo.
+7.  **REGLA FINAL:** Cuando hayas completado TODAS las tareas solicitadas por el usuario y verificado tu trabajo, tu respuesta final NO debe ser un JSON. Debe empezar directamente con la frase `Final Answer:` seguida de tu resumen completo.
 
 EJEMPLO DE RESPUESTA FINAL CORRECTA:
 Final Answer: He descargado exitosamente la curva de luz para la estrella X y he verificado que el archivo CSV contiene 1500 puntos de datos. La tarea ha sido completada.
@@ -52,63 +66,212 @@ Action:
 ...
 """
 
-def create_resilient_agent_executor():
-    """Crea y configura un agente de IA que no se detiene ante errores."""
+# Herramientas del agente, en un orden fijo para que su descripción sea siempre la misma
+TOOLS = [
+    PythonREPLTool(),
+    ListConfirmedExoplanetHostsTool(),
+    GetStarLightCurveTool(),
+    GetStarLightCurvesBatchTool(),
+    ListStarsByMissionTool(),
+    GetLabeledExoplanetDatasetTool()
+]
+
+# El mensaje de sistema se renderiza una sola vez con {tools} y {tool_names} ya
+# resueltos y se pasa como SystemMessage, que ChatPromptTemplate reutiliza tal
+# cual sin volver a formatearlo en cada invoke. Es idéntico byte a byte en cada
+# llamada y todo lo que cambia (input y scratchpad) va detrás, así el proveedor
+# puede reutilizar la caché del prefijo en lugar de volver a procesarlo.
+SYSTEM_MESSAGE = SystemMessage(content=SYSTEM_PROMPT.format(
+    tools=render_text_description_and_args(TOOLS),
+    tool_names=", ".join(t.name for t in TOOLS),
+))
+
+PROMPT = ChatPromptTemplate.from_messages([
+    SYSTEM_MESSAGE,
+    ("user", "{input}"),
+    ("ai", "{agent_scratchpad}"),
+])
+
+class MultiActionJSONOutputParser(JSONAgentOutputParser):
+    """
+    Igual que JSONAgentOutputParser, pero una lista JSON de acciones se
+    devuelve completa (en vez de quedarse con la primera), para que el
+    AgentExecutor asíncrono las ejecute a la vez con asyncio.gather.
+    """
+
+    def parse(self, text):
+        try:
+            response = parse_json_markdown(text)
+        except Exception:
+            response = None
+        if isinstance(response, list) and len(response) > 1:
+            try:
+                # El log completo va solo en la primera acción para no duplicar el
+                # scratchpad; las demás (log vacío) forman grupo con ella
+                return [
+                    AgentAction(r["action"], r.get("action_input") or {}, text if i == 0 else "")
+                    for i, r in enumerate(response)
+                    if r["action"] != "Final Answer"
+                ] or super().parse(text)
+            except (KeyError, TypeError) as e:
+                raise OutputParserException(f"Could not parse LLM output: {text}") from e
+        return super().parse(text)
+
+
+# Límite de pasos del agente y de pasos completos que se reenvían en el scratchpad:
+# así el prefill de cada paso no crece con todo el historial
+MAX_ITERACIONES = 10
+MAX_PASOS_SCRATCHPAD = 5
+
+def _agrupar_pasos(intermediate_steps):
+    """
+    Agrupa los pasos por respuesta del LLM: una acción con log abre grupo y las
+    acciones paralelas que la siguen con log vacío (ver MultiActionJSONOutputParser)
+    pertenecen a él.
+    """
+    grupos = []
+    for paso in intermediate_steps:
+        if paso[0].log or not grupos:
+            grupos.append([])
+        grupos[-1].append(paso)
+    return grupos
+
+def formatear_scratchpad(intermediate_steps, max_pasos=MAX_PASOS_SCRATCHPAD):
+    """
+    Como format_log_to_str, pero solo con los últimos `max_pasos` Thought/Action/Observation.
+
+    Se cuentan respuestas del LLM, no acciones: las acciones lanzadas juntas se
+    conservan u omiten en bloque, para no reenviar Observations de un grupo
+    cuyo log (el texto con las acciones) ya se ha descartado.
+    """
+    grupos = _agrupar_pasos(intermediate_steps)
+    omitidos = len(grupos) - max_pasos
+    if omitidos <= 0:
+        return format_log_to_str(intermediate_steps)
+    conservados = [paso for grupo in grupos[-max_pasos:] for paso in grupo]
+    return f"[... {omitidos} pasos anteriores omitidos ...]\n" + format_log_to_str(conservados)
+
+def _accion_completa(buffer):
+    """
+    True cuando el texto ya contiene un bloque ``` cerrado que sigue a `Action:`.
+
+    Se ignora el razonamiento <think>...</think> de deepseek (puede traer bloques
+    de código) y nunca se corta una respuesta que ya contiene `Final Answer:`,
+    porque el resumen final también puede incluir bloques de código.
+    """
+    fin_think = buffer.rfind("</think>")
+    if fin_think != -1:
+        buffer = buffer[fin_think + len("</think>"):]
+    elif "<think>" in buffer:
+        # El razonamiento sigue abierto: aún no hay acción
+        return False
+    if "Final Answer:" in buffer:
+        return False
+    accion = buffer.find("Action:")
+    if accion == -1:
+        return False
+    inicio = buffer.find("```", accion)
+    return inicio != -1 and buffer.find("```", inicio + 3) != -1
+
+def generar_hasta_accion(llm):
+    """
+    Envuelve el LLM para recibir la respuesta en streaming y cortarla en cuanto
+    se cierra el bloque JSON de la acción, de modo que la herramienta empieza a
+    ejecutarse sin esperar al resto de tokens. Una respuesta con "Final Answer:"
+    se recibe siempre completa, aunque contenga bloques de código.
+    """
+    def generar(messages):
+        buffer = ""
+        for chunk in llm.stream(messages):
+            buffer += chunk.content
+            if _accion_completa(buffer):
+                break
+        return buffer
+
+    async def agenerar(messages):
+        buffer = ""
+        async for chunk in llm.astream(messages):
+            buffer += chunk.content
+            if _accion_completa(buffer):
+                break
+        return buffer
+
+    return RunnableLambda(generar, afunc=agenerar)
+
+@functools.lru_cache(maxsize=None)
+def create_resilient_agent_executor(api_key, enable_parallel_tool_execution=True):
+    """
+    Crea y configura un agente de IA que no se detiene ante errores.
+
+    Con enable_parallel_tool_execution, las acciones independientes que el LLM
+    pida en un mismo paso se ejecutan en paralelo (al usar ainvoke).
+
+    Se construye un executor por API key y se reutiliza en cada llamada: las
+    herramientas y el prompt ya son constantes del módulo, y cada cliente ChatGroq
+    mantiene viva su sesión HTTP entre peticiones con la misma key.
+    """
     
     try:
-        llm = ChatGroq(model_name="deepseek-r1-distill-llama-70b", temperature=0.3)
+        llm = ChatGroq(model_name="deepseek-r1-distill-llama-70b", groq_api_key=api_key, temperature=0.3, streaming=True)
     except Exception as e:
         print(f"🚨 Error al inicializar el modelo de Groq: {e}")
         sys.exit(1) # Salir si no podemos crear el modelo
 
-    tools = [
-        PythonREPLTool(),
-        ListConfirmedExoplanetHostsTool(),
-        GetStarLightCurveTool(),
-        ListStarsByMissionTool(),
-        GetLabeledExoplanetDatasetTool()
-    ]
-
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", SYSTEM_PROMPT),
-        ("user", "{input}"),
-        ("ai", "{agent_scratchpad}"),
-    ])
-
-    agent = create_structured_chat_agent(llm, tools, prompt)
+    # Equivalente a create_structured_chat_agent, pero con un parser que admite varias acciones
+    output_parser = MultiActionJSONOutputParser() if enable_parallel_tool_execution else JSONAgentOutputParser()
+    agent = (
+        RunnablePassthrough.assign(
+            agent_scratchpad=lambda x: formatear_scratchpad(x["intermediate_steps"]),
+        )
+        | PROMPT
+        | generar_hasta_accion(llm.bind(stop=["\nObservation"]))
+        | output_parser
+    )
 
     # --- CAMBIO CLAVE: HABILITAR EL MANEJO DE ERRORES ---
     agent_executor = AgentExecutor(
         agent=agent,
-        tools=tools,
-        verbose=True,
+        tools=TOOLS,
+        # Trazas paso a paso solo si se piden explícitamente (EXOHUNTER_VERBOSE=1)
+        verbose=os.getenv("EXOHUNTER_VERBOSE") == "1",
         # Esto evita que el programa se caiga. El error se pasa al LLM como una observación.
         handle_parsing_errors=True,
-        max_iterations=25
+        max_iterations=MAX_ITERACIONES
     )
     
     return agent_executor
 
+def elegir_api_key_groq():
+    """
+    Siguiente key de Groq según el gestor compartido de keys (la menos usada),
+    o GROQ_API_KEY si cloud_constants no tiene ninguna. No modifica os.environ.
+    """
+    try:
+        _, api_key = get_random_service_key("groq")
+    except ValueError:
+        api_key = None
+    return api_key or os.getenv("GROQ_API_KEY")
+
 def run_ML_Engineer(prompt_to_llm_engineer):
     """
     Función principal para configurar el entorno y ejecutar el agente resiliente.
     """
-    os.environ["GROQ_API_KEY"] = random.choice(["PONER AQUÍ API-KEY"
-             ])
-    api_key = os.getenv("GROQ_API_KEY")
+    api_key = elegir_api_key_groq()
     if not api_key:
-        print("🚨 Error: La variable de entorno GROQ_API_KEY no está configurada.")
-        print("   Por favor, ejecute 'export GROQ_API_KEY=su_clave_aqui' en su terminal.")
+        print("🚨 Error: No hay API key de Groq configurada.")
+        print("   Añádala en cloud/cloud_constants.py o ejecute 'export GROQ_API_KEY=su_clave_aqui' en su terminal.")
         return
 
     print("🤖 Bot Científico de Datos (v5 - Final y Resiliente) está listo!")
     print("-" * 75)
 
-    agent_executor = create_resilient_agent_executor()
+    agent_executor = create_resilient_agent_executor(api_key)
     
     try:
         print(f"Usuario: {prompt_to_llm_engineer}\n")
-        response = agent_executor.invoke({"input": prompt_to_llm_engineer})
+        # ainvoke ejecuta con asyncio.gather las herramientas pedidas en un mismo paso
+        # Sin callbacks adicionales (tracing, handlers heredados) en el bucle del agente
+        response = asyncio.run(agent_executor.ainvoke({"input": prompt_to_llm_engineer}, config={"callbacks": []}))
         print("\n" + "="*75)
         print(f"Respuesta Final del Bot:\n{response['output']}")
         print("="*75)
@@ -1,21 +1,178 @@
+import asyncio
+import functools
+import hashlib
+import io
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 import pandas as pd
 import numpy as np
-import lightkurve as lk
-from astroquery.ipac.nexsci.nasa_exoplanet_archive import NasaExoplanetArchive
-from astroquery.mast import Observations
-from sklearn.impute import SimpleImputer
+import requests
+from cachetools import LRUCache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
 from typing import Type, Dict, List, Optional
 
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+try:
+    import polars as pl
+    POLARS_AVAILABLE = True
+except ImportError:
+    POLARS_AVAILABLE = False
+
+# lightkurve, astroquery y scipy tardan segundos en importarse: se
+# cargan dentro de la herramienta que los usa, la primera vez que se ejecuta
+@functools.cache
+def _lazy_lk():
+    import lightkurve as lk
+    return lk
+
+# Caché en disco de tablas descargadas de la NASA, válida durante 24 horas
+CACHE_DIR = Path(__file__).resolve().parent.parent / "cache" / ".nasa_cache"
+CACHE_TTL_SECONDS = 24 * 60 * 60
+
+# Servicio TAP del NASA Exoplanet Archive y filas por bloque al leerlo en streaming
+TAP_URL = "https://exoplanetarchive.ipac.caltech.edu/TAP/sync"
+
+# Una sola sesión HTTP para todas las consultas al archivo de la NASA: las
+# conexiones keep-alive se reutilizan entre tablas (sin repetir TCP + TLS) y los
+# fallos transitorios del servidor se reintentan con espera exponencial
+HTTP_SESSION = requests.Session()
+HTTP_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4, pool_maxsize=8,
+    max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=(500, 502, 503, 504)),
+))
+TAP_CHUNKSIZE = 50_000
+TAP_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# Tabla TAP, columna de disposición y disposiciones que se etiquetan (conf, cand,
+# fp/false) por misión. El filtro se aplica en el servidor: las filas que acabarían
+# como "unknown" no se descargan. En la tabla toi (PC, CP, KP, FP, APC, FA) solo
+# "FP" coincide con esas reglas de etiquetado
+TABLAS_POR_MISION = {
+    "Kepler": ("cumulative", "koi_disposition", ("CONFIRMED", "CANDIDATE", "FALSE POSITIVE")),
+    "TESS": ("toi", "tfopwg_disp", ("FP",)),
+    "K2": ("k2pandc", "disposition", ("CONFIRMED", "CANDIDATE", "FALSE POSITIVE")),
+}
+
+# Palabras clave que identifican las columnas usadas como características,
+# compiladas en una sola expresión regular. La "a" (semieje mayor) solo cuenta
+# como segmento completo del nombre (p. ej. "koi_a"): como subcadena aceptaba
+# casi cualquier columna ("ra", "pl_name"...)
+FEATURE_RE = re.compile(r"period|dur|depth|rad|mass|st_|(?:^|_)a(?:_|$)", re.IGNORECASE)
+
+# Clases de la etiqueta: y se guarda como categórica (un código de 1 byte por fila
+# en memoria y codificación por diccionario en Parquet) en lugar de strings de Python
+LABEL_DTYPE = pd.CategoricalDtype(["confirmed", "candidate", "false_positive"])
+
+# Caché de ficheros FITS de lightkurve: una curva ya descargada no se vuelve a pedir a MAST
+LIGHTKURVE_CACHE_DIR = CACHE_DIR.parent / ".lightkurve_cache"
+
+# Las curvas de luz se guardan en Parquet (columnar, comprimido con zstd) si
+# pyarrow está instalado; si no, en CSV como hasta ahora
+if PYARROW_AVAILABLE:
+    LIGHT_CURVE_EXT = "parquet"
+    LIGHT_CURVE_READER = "pd.read_parquet"
+else:
+    LIGHT_CURVE_EXT = "csv"
+    LIGHT_CURVE_READER = "pd.read_csv"
+
+# Resultados de las herramientas que siguen en memoria, por handle y por ruta de
+# archivo. La herramienta de Python del agente se ejecuta en este mismo proceso,
+# así que leer_resultado se los entrega sin volver a leer ni parsear el archivo
+RESULT_STORE_MAXSIZE = 64
+_RESULT_STORE = LRUCache(maxsize=RESULT_STORE_MAXSIZE)
+_RESULT_STORE_LOCK = threading.Lock()
+
+def registrar_resultado(df: pd.DataFrame, file_path: str) -> str:
+    """Guarda en memoria el DataFrame escrito en `file_path` y devuelve su handle."""
+    handle = uuid.uuid4().hex
+    with _RESULT_STORE_LOCK:
+        _RESULT_STORE[handle] = df
+        _RESULT_STORE[file_path] = df
+    return handle
+
+def leer_resultado(handle_or_path: str) -> pd.DataFrame:
+    """
+    DataFrame de un resultado de herramienta a partir de su handle o de su ruta.
+
+    Si sigue en memoria se devuelve directamente; si no, se lee del archivo
+    (Parquet o CSV según la extensión).
+    """
+    with _RESULT_STORE_LOCK:
+        df = _RESULT_STORE.get(handle_or_path)
+    if df is not None:
+        return df
+    if str(handle_or_path).endswith(".parquet"):
+        return pd.read_parquet(handle_or_path)
+    return pd.read_csv(handle_or_path)
+
+class ThreadedTool(BaseTool):
+    """
+    Base de las herramientas: _arun ejecuta _run en un hilo, de modo que varias
+    llamadas de red (MAST, NASA Exoplanet Archive, lightkurve) se solapan
+    cuando el agente las lanza a la vez.
+    """
+
+    async def _arun(self, *args, **kwargs):
+        return await asyncio.to_thread(self._run, *args, **kwargs)
+
+@functools.lru_cache(maxsize=1)
+def cargar_planetas_confirmados() -> pd.DataFrame:
+    """
+    Tabla de planetas confirmados (solo la columna tic_id) del NASA Exoplanet Archive.
+
+    Se guarda en memoria para el resto del proceso y en disco (Parquet si
+    pyarrow está instalado, CSV si no) para los arranques siguientes; la copia
+    en disco se descarta pasadas CACHE_TTL_SECONDS.
+    """
+    ruta = CACHE_DIR / ("confirmed_planets.parquet" if PYARROW_AVAILABLE else "confirmed_planets.csv")
+    if ruta.exists() and time.time() - ruta.stat().st_mtime < CACHE_TTL_SECONDS:
+        if PYARROW_AVAILABLE:
+            return pd.read_parquet(ruta, columns=["tic_id"])
+        return pd.read_csv(ruta, usecols=["tic_id"], dtype={"tic_id": str})
+
+    # Consulta TAP directa a la tabla de planetas confirmados (pscomppars) pidiendo
+    # solo tic_id: sin importar astroquery ni pasar por una tabla de astropy
+    params = {"query": "select tic_id from pscomppars", "format": "csv"}
+    resp = HTTP_SESSION.get(TAP_URL, params=params, timeout=60)
+    resp.raise_for_status()
+    planets_df = pd.read_csv(io.StringIO(resp.text), dtype={"tic_id": str})
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    if PYARROW_AVAILABLE:
+        planets_df.to_parquet(ruta, compression="zstd", index=False)
+    else:
+        planets_df.to_csv(ruta, index=False)
+    return planets_df
+
+@functools.lru_cache(maxsize=1)
+def tic_ids_confirmados() -> np.ndarray:
+    """TIC IDs únicos (sin nulos) de las estrellas con planetas confirmados, en orden de aparición."""
+    tic_ids = cargar_planetas_confirmados()['tic_id'].to_numpy()
+    # Máscara vectorizada sobre el array de NumPy, sin crear una Series intermedia
+    return pd.unique(tic_ids[~pd.isna(tic_ids)])
+
 # ==============================================================================
 # --- Herramienta 1: Listar estrellas con planetas confirmados (Resiliente) ---
 # ==============================================================================
 class ListHostsInput(BaseModel):
     max_results: int = Field(default=10, description="El número máximo de identificadores de estrellas a devolver.")
 
-class ListConfirmedExoplanetHostsTool(BaseTool):
+class ListConfirmedExoplanetHostsTool(ThreadedTool):
     name: str = "list_confirmed_exoplanet_hosts"
     description: str = (
         "Útil para cuando necesitas obtener una lista de identificadores (TIC IDs) de estrellas "
@@ -26,11 +183,10 @@ class ListConfirmedExoplanetHostsTool(BaseTool):
     def _run(self, max_results: int = 10) -> Dict:
         try:
             print(f"--- TOOL: Buscando hasta {max_results} estrellas con planetas confirmados... ---")
-            planets_table = NasaExoplanetArchive.get_confirmed_planet_table(all_columns=True)
-            planets_df = planets_table.to_pandas()
-            positive_tic_ids = planets_df['tic_id'].dropna().unique().tolist()
+            positive_tic_ids = tic_ids_confirmados()
 
-            results = positive_tic_ids[:max_results]
+            # Solo se convierten a lista de Python los identificadores devueltos
+            results = positive_tic_ids[:max_results].tolist()
             summary = f"Se encontraron {len(positive_tic_ids)} estrellas en total. Devolviendo las primeras {len(results)}."
             print(summary)
             return {"star_identifiers": results, "summary": summary}
@@ -46,43 +202,142 @@ class ListConfirmedExoplanetHostsTool(BaseTool):
 class GetLightCurveInput(BaseModel):
     star_id: str = Field(description="El identificador de la estrella. Debe incluir el prefijo, ej: 'TIC 307210830', 'KIC 757076'.")
     mission: Optional[str] = Field(default="TESS", description="La misión de la cual descargar los datos, como 'TESS', 'Kepler' o 'K2'.")
+    all_sectors: bool = Field(default=False, description="Si es True, descarga y une todos los sectores/trimestres disponibles en vez de solo el primero.")
+    force_refresh: bool = Field(default=False, description="Si es True, vuelve a descargar la curva aunque ya exista su archivo.")
 
-class GetStarLightCurveTool(BaseTool):
+class GetStarLightCurveTool(ThreadedTool):
     name: str = "get_star_light_curve_to_file"
     description: str = (
         "Descarga los datos de la curva de luz para una estrella específica. "
-        "IMPORTANTE: No devuelve los datos directamente. En su lugar, guarda los datos en un archivo CSV "
+        f"IMPORTANTE: No devuelve los datos directamente. En su lugar, guarda los datos en un archivo .{LIGHT_CURVE_EXT} "
         "y devuelve un diccionario con la ruta a ese archivo ('file_path'). "
-        "Luego debes usar la herramienta de python para leer y analizar ese archivo."
+        f"Luego debes usar la herramienta de python para leer ese archivo con {LIGHT_CURVE_READER} y analizarlo."
     )
     args_schema: Type[BaseModel] = GetLightCurveInput
 
-    def _run(self, star_id: str, mission: str = "TESS") -> Dict:
-        try:
-            print(f"--- TOOL: Buscando y guardando curva de luz para '{star_id}' en misión '{mission}'... ---")
-            search = lk.search_lightcurve(star_id, mission=mission, author="SPOC")
+    def _run(self, star_id: str, mission: str = "TESS", all_sectors: bool = False, force_refresh: bool = False) -> Dict:
+        return descargar_curva_de_luz(star_id, mission, all_sectors, force_refresh, tool_name=self.name)
+
+def aplanar_curva(lc, window_length: int = 401, polyorder: int = 2):
+    """
+    Normaliza y aplana una curva de luz dividiendo por su tendencia Savitzky-Golay.
+
+    Sustituye a lc.normalize().flatten(): un único savgol_filter vectorizado de
+    SciPy, sin las iteraciones de sigma-clipping de lightkurve. Devuelve los
+    arrays (time, flux).
+    """
+    from scipy.signal import savgol_filter
+
+    lc = lc.remove_nans()
+    time_values = lc.time.value
+    # float32 de principio a fin (savgol_filter lo conserva) y divisiones en el
+    # propio array: una sola copia del flujo en lugar de una por operación
+    flux = np.array(lc.flux.value, dtype=np.float32)
+    flux /= np.median(flux)
+
+    # La ventana debe ser impar y no mayor que la curva
+    window_length = min(window_length, len(flux) if len(flux) % 2 else len(flux) - 1)
+    if window_length <= polyorder:
+        return time_values, flux
+
+    flux /= savgol_filter(flux, window_length, polyorder, mode="interp")
+    return time_values, flux
 
+@functools.lru_cache(maxsize=4096)
+def ruta_curva_de_luz(star_id: str, mission: str = "TESS", all_sectors: bool = False) -> str:
+    """Nombre del archivo en el que se guarda la curva de luz de una estrella."""
+    safe_star_id = star_id.replace(" ", "_").replace("-", "_")
+    sufijo = "_all" if all_sectors else ""
+    return f"light_curve_{safe_star_id}_{mission}{sufijo}.{LIGHT_CURVE_EXT}"
+
+def descargar_curva_de_luz(star_id: str, mission: str = "TESS", all_sectors: bool = False,
+                           force_refresh: bool = False,
+                           tool_name: str = "get_star_light_curve_to_file") -> Dict:
+    """
+    Descarga, aplana y guarda (Parquet o CSV) la curva de luz de una estrella.
+
+    Si el archivo ya existe y no está vacío se devuelve sin volver a descargar,
+    salvo con force_refresh.
+    """
+    file_path = ruta_curva_de_luz(star_id, mission, all_sectors)
+    if not force_refresh and os.path.exists(file_path) and os.path.getsize(file_path) > 0:
+        summary = f"Caché: la curva de luz de '{star_id}' ya estaba guardada en '{file_path}'."
+        print(f"  -> {summary}")
+        return {"status": "success", "summary": summary, "file_path": file_path}
+
+    try:
+        print(f"--- TOOL: Buscando y guardando curva de luz para '{star_id}' en misión '{mission}'... ---")
+        lk = _lazy_lk()
+        search = lk.search_lightcurve(star_id, mission=mission, author="SPOC")
+
+        if len(search) == 0:
+            search = lk.search_lightcurve(star_id, mission=mission)
             if len(search) == 0:
-                search = lk.search_lightcurve(star_id, mission=mission)
-                if len(search) == 0:
-                    raise ValueError("No se encontraron curvas de luz para este objetivo.")
+                raise ValueError("No se encontraron curvas de luz para este objetivo.")
 
-            lc = search.download()
-            lc_flat = lc.normalize().flatten(window_length=401)
-            df = pd.DataFrame({'time': lc_flat.time.value, 'flux': lc_flat.flux.value})
+        LIGHTKURVE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        if all_sectors:
+            lc = search.download_all(download_dir=str(LIGHTKURVE_CACHE_DIR)).stitch()
+        else:
+            lc = search.download(download_dir=str(LIGHTKURVE_CACHE_DIR))
+        time_values, flux_flat = aplanar_curva(lc, window_length=401)
+        # flux en float32 (la mitad de memoria y disco; sobra para la SNR de una curva
+        # de luz); time se queda en float64, float32 perdería segundos en BTJD
+        df = pd.DataFrame({'time': time_values, 'flux': flux_flat.astype(np.float32, copy=False)})
 
-            safe_star_id = star_id.replace(" ", "_").replace("-", "_")
-            file_path = f"light_curve_{safe_star_id}_{mission}.csv"
-            df.to_csv(file_path, index=False)
+        if PYARROW_AVAILABLE:
+            df.to_parquet(file_path, compression="zstd", index=False)
+        else:
+            # 9 cifras significativas: suficientes para reconstruir un float32 y para el tiempo
+            df.to_csv(file_path, index=False, float_format="%.9g")
 
-            summary = f"Éxito: Se guardaron {len(df)} puntos de datos en el archivo '{file_path}'."
-            print(f"  -> {summary}")
+        summary = f"Éxito: Se guardaron {len(df)} puntos de datos en el archivo '{file_path}'."
+        print(f"  -> {summary}")
 
-            return {"status": "success", "summary": summary, "file_path": file_path}
-        except Exception as e:
-            error_message = f"Falló la descarga o procesamiento para '{star_id}': {e}"
-            print(f"  -> ERROR en {self.name}: {error_message}")
-            return {"status": "error", "message": error_message}
+        handle = registrar_resultado(df, file_path)
+        return {"status": "success", "summary": summary, "file_path": file_path, "handle": handle}
+    except Exception as e:
+        error_message = f"Falló la descarga o procesamiento para '{star_id}': {e}"
+        print(f"  -> ERROR en {tool_name}: {error_message}")
+        return {"status": "error", "message": error_message}
+
+# ==============================================================================
+# --- Herramienta 2b: Obtener varias curvas de luz a la vez (Resiliente) ---
+# ==============================================================================
+class GetLightCurvesBatchInput(BaseModel):
+    star_ids: List[str] = Field(description="Lista de identificadores de estrellas, con prefijo, ej: ['TIC 307210830', 'KIC 757076'].")
+    mission: Optional[str] = Field(default="TESS", description="La misión de la cual descargar los datos, como 'TESS', 'Kepler' o 'K2'.")
+    all_sectors: bool = Field(default=False, description="Si es True, descarga y une todos los sectores/trimestres de cada estrella.")
+    force_refresh: bool = Field(default=False, description="Si es True, vuelve a descargar las curvas aunque ya existan sus archivos.")
+
+class GetStarLightCurvesBatchTool(ThreadedTool):
+    name: str = "get_star_light_curves_batch_to_files"
+    description: str = (
+        "Igual que get_star_light_curve_to_file, pero para una lista de estrellas: descarga sus curvas de luz "
+        f"en paralelo y guarda cada una en un archivo .{LIGHT_CURVE_EXT} (se lee con {LIGHT_CURVE_READER}). "
+        "Úsala siempre que necesites más de una curva de luz. "
+        "Devuelve las rutas de los archivos ('file_paths'), sus handles en memoria ('handles') y los errores por estrella ('errors')."
+    )
+    args_schema: Type[BaseModel] = GetLightCurvesBatchInput
+    # Descargas limitadas por la red: varios hilos por núcleo
+    max_workers: int = min(32, (os.cpu_count() or 1) * 4)
+
+    def _run(self, star_ids: List[str], mission: str = "TESS", all_sectors: bool = False, force_refresh: bool = False) -> Dict:
+        # Sin duplicados (conservando el orden): dos hilos no deben descargar ni escribir el mismo archivo
+        star_ids = list(dict.fromkeys(star_ids))
+        print(f"--- TOOL: Descargando {len(star_ids)} curvas de luz de la misión '{mission}' en paralelo... ---")
+        # Las descargas son I/O de red, así que los hilos se solapan sin competir por el GIL
+        with ThreadPoolExecutor(max_workers=self.max_workers) as ex:
+            resultados = list(ex.map(lambda star_id: descargar_curva_de_luz(star_id, mission, all_sectors, force_refresh, tool_name=self.name), star_ids))
+
+        file_paths = [r["file_path"] for r in resultados if r["status"] == "success"]
+        # Handles en memoria de las curvas descargadas ahora (las leídas de caché no tienen)
+        handles = {r["file_path"]: r["handle"] for r in resultados if "handle" in r}
+        errors = {star_id: r["message"] for star_id, r in zip(star_ids, resultados) if r["status"] == "error"}
+
+        summary = f"Se guardaron {len(file_paths)} de {len(star_ids)} curvas de luz."
+        print(f"  -> {summary}")
+        return {"status": "success" if file_paths else "error", "summary": summary, "file_paths": file_paths, "handles": handles, "errors": errors}
 
 # ==============================================================================
 # --- Herramienta 3: Listar estrellas por misión (Resiliente y Rápida) ---
@@ -91,7 +346,7 @@ class ListStarsByMissionInput(BaseModel):
     mission: str = Field(description="La misión de la cual obtener los nombres de las estrellas. Opciones: 'Kepler', 'K2', 'TESS'.")
     limit: int = Field(default=10, description="El número máximo de estrellas a devolver.")
 
-class ListStarsByMissionTool(BaseTool):
+class ListStarsByMissionTool(ThreadedTool):
     name: str = "list_stars_by_mission"
     description: str = (
         "Devuelve una lista de identificadores de estrellas que fueron observadas por una misión específica (Kepler, K2, TESS). "
@@ -107,29 +362,14 @@ class ListStarsByMissionTool(BaseTool):
             
             print(f"--- TOOL: Buscando {limit} estrellas de la misión {mission} con una consulta optimizada... ---")
 
-            # SOLUCIÓN DEFINITIVA: Añadir filtros para hacer la consulta extremadamente rápida.
-            # Esto evita que la consulta se quede colgada o tarde demasiado.
-            query_params = {
-                "obs_collection": mission,
-                "dataproduct_type": "timeseries",
-                "intentType": "science",
-                # CORRECCIÓN: Cambiar 'max_records' por 'pagesize' o un parámetro similar
-                "pagesize": limit 
-            }
-            
-            # Añadir filtros específicos de la misión para acotar la búsqueda
-            if mission == "TESS":
-                query_params["sequence_number"] = 1 # Busca solo en el Sector 1 de TESS.
-            elif mission == "Kepler":
-                query_params["quarter"] = 1 # Busca solo en el primer trimestre de Kepler.
+            # Los límites cercanos comparten la misma consulta (y su caché): se pide
+            # la potencia de dos inmediatamente superior a `limit`
+            target_names = consultar_target_names(mission, 1 << limit.bit_length())
 
-            obs_table = Observations.query_criteria(**query_params)
-
-            if len(obs_table) == 0:
+            if len(target_names) == 0:
                  return {"error": f"La consulta optimizada no devolvió observaciones para la misión {mission}."}
 
-            df = obs_table.to_pandas()
-            estrellas = df["target_name"].unique().tolist()[:limit]
+            estrellas = pd.unique(target_names)[:limit].tolist()
             
             if not estrellas:
                 return {"error": "La consulta devolvió datos, pero no se pudieron extraer identificadores de estrellas."}
@@ -143,62 +383,273 @@ class ListStarsByMissionTool(BaseTool):
             print(f"  -> ERROR en {self.name}: {error_message}")
             return {"error": error_message}
 
+@functools.lru_cache(maxsize=32)
+def consultar_target_names(mission: str, pagesize: int) -> np.ndarray:
+    """
+    target_name de las primeras `pagesize` observaciones de series temporales de MAST para una misión.
+
+    astroquery fuerza cache=False en las peticiones al portal de MAST, así que
+    las consultas repetidas se memorizan aquí para el resto del proceso y en
+    disco (.npy en CACHE_DIR, válido CACHE_TTL_SECONDS) para los arranques siguientes.
+    """
+    ruta = CACHE_DIR / f"mast_targets_{mission}_{pagesize}.npy"
+    if ruta.exists() and time.time() - ruta.stat().st_mtime < CACHE_TTL_SECONDS:
+        return np.load(ruta)
+
+    from astroquery.mast import Observations
+
+    # SOLUCIÓN DEFINITIVA: Añadir filtros para hacer la consulta extremadamente rápida.
+    # Esto evita que la consulta se quede colgada o tarde demasiado.
+    query_params = {
+        "obs_collection": mission,
+        "dataproduct_type": "timeseries",
+        "intentType": "science",
+    }
+
+    # Añadir filtros específicos de la misión para acotar la búsqueda
+    if mission == "TESS":
+        query_params["sequence_number"] = 1 # Busca solo en el Sector 1 de TESS.
+    elif mission == "Kepler":
+        query_params["quarter"] = 1 # Busca solo en el primer trimestre de Kepler.
+
+    # Con pagesize sin page, astroquery descarga todas las páginas una tras otra:
+    # page=1 limita la respuesta del servidor a las primeras `pagesize` filas
+    obs_table = Observations.query_criteria(pagesize=pagesize, page=1, **query_params)
+    # Solo hace falta una columna: se lee directamente de la tabla de astropy
+    # en lugar de convertir la tabla entera a pandas
+    target_names = np.asarray(obs_table["target_name"]).astype(str)
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    np.save(ruta, target_names)
+    return target_names
+
+def guardar_csv(datos, ruta: str) -> None:
+    """
+    Guarda un DataFrame o Series en CSV con su índice, como DataFrame.to_csv.
+
+    Con pyarrow se usa su escritor CSV en C++, que codifica por lotes en varios
+    hilos en lugar de formatear cada celda desde pandas.
+    """
+    if not PYARROW_AVAILABLE:
+        datos.to_csv(ruta)
+        return
+    df = datos.to_frame() if isinstance(datos, pd.Series) else datos
+    # Columna del índice sin nombre, igual que la cabecera que escribe pandas
+    df = df.reset_index(names=df.index.name or "")
+    pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), ruta,
+                    write_options=pacsv.WriteOptions(include_header=True, batch_size=16384))
+
+def es_columna_de_caracteristicas(nombre: str) -> bool:
+    return FEATURE_RE.search(nombre) is not None
+
+@functools.lru_cache(maxsize=8)
+def columnas_tabla_tap(nombre_tabla: str) -> tuple:
+    """
+    Nombres de las columnas de una tabla del NASA Exoplanet Archive, según TAP_SCHEMA.
+
+    Se guardan en memoria y en disco (CACHE_DIR, válidos CACHE_TTL_SECONDS),
+    así la consulta de esquema apenas cuesta frente a la descarga de la tabla.
+    """
+    ruta = CACHE_DIR / f"tap_columns_{nombre_tabla}.csv"
+    if ruta.exists() and time.time() - ruta.stat().st_mtime < CACHE_TTL_SECONDS:
+        return tuple(pd.read_csv(ruta)["column_name"])
+
+    params = {"query": f"select column_name from TAP_SCHEMA.columns where table_name='{nombre_tabla}'", "format": "csv"}
+    resp = HTTP_SESSION.get(TAP_URL, params=params, timeout=60)
+    resp.raise_for_status()
+    columnas = pd.read_csv(io.StringIO(resp.text))
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    columnas.to_csv(ruta, index=False)
+    return tuple(columnas["column_name"])
+
 # ==============================================================================
 # --- Herramienta 4: Obtener dataset para Machine Learning (Resiliente) ---
 # ==============================================================================
 class GetLabeledDatasetInput(BaseModel):
-    mission: str = Field(description="La misión para la cual construir el dataset. Opciones: 'Kepler', 'K2', 'TESS'.")
+    mission: Optional[str] = Field(default=None, description="La misión para la cual construir el dataset. Opciones: 'Kepler', 'K2', 'TESS'.")
+    missions: Optional[List[str]] = Field(default=None, description="Lista de misiones cuyos datasets se construyen a la vez, ej: ['Kepler', 'K2', 'TESS']. Si se indica, se ignora 'mission'.")
+    format: str = Field(default="parquet", description="Formato de los archivos de salida: 'parquet' (por defecto, se lee con pd.read_parquet) o 'csv'.")
 
-class GetLabeledExoplanetDatasetTool(BaseTool):
+class GetLabeledExoplanetDatasetTool(ThreadedTool):
     name: str = "get_labeled_exoplanet_dataset"
     description: str = (
         "Descarga datos tabulares de exoplanetas candidatos de una misión (Kepler, K2, TESS) desde el NASA Exoplanet Archive. "
         "Procesa los datos, los separa en características (features) y etiquetas (labels) listos para Machine Learning, "
-        "los guarda en archivos CSV y devuelve las rutas a dichos archivos."
+        "los guarda en archivos Parquet (o CSV con format='csv') y devuelve las rutas a dichos archivos. "
+        "Si necesitas varias misiones, pásalas juntas en 'missions': se construyen en paralelo y el resultado "
+        "de cada una queda en 'datasets'."
     )
     args_schema: Type[BaseModel] = GetLabeledDatasetInput
 
-    def _cargar_datos_nasa(self, nombre_tabla: str) -> pd.DataFrame:
-        base_url = "https://exoplanetarchive.ipac.caltech.edu/TAP/sync?query=select+*+from+"
-        formatos = "&format=csv"
-        url = base_url + nombre_tabla + formatos
-        df = pd.read_csv(url, low_memory=False)
+    def _cargar_datos_nasa(self, nombre_tabla: str, columns: List[str], where: Optional[str] = None) -> pd.DataFrame:
+        # Solo se piden al servidor las columnas (y las filas) que se van a usar
+        query = f"select {','.join(columns)} from {nombre_tabla}"
+        if where:
+            query += f" where {where}"
+        # Las tablas del archivo cambian cada varias semanas: una descarga con la
+        # misma consulta se reutiliza desde disco durante TAP_CACHE_TTL_SECONDS
+        clave = hashlib.sha1(query.encode("utf-8")).hexdigest()[:12]
+        ruta = CACHE_DIR / f"tap_{nombre_tabla}_{clave}.{'parquet' if PYARROW_AVAILABLE else 'pkl'}"
+        if ruta.exists() and time.time() - ruta.stat().st_mtime < TAP_CACHE_TTL_SECONDS:
+            df = pd.read_parquet(ruta) if PYARROW_AVAILABLE else pd.read_pickle(ruta)
+            print(f"  -> Tabla '{nombre_tabla}' leída de la caché con {df.shape[0]} filas y {df.shape[1]} columnas.")
+            return df
+
+        params = {"query": query, "format": "csv"}
+        # La respuesta se parsea por bloques mientras llega, sin tener el CSV
+        # entero en memoria ni hacer la inferencia de tipos sobre todo el archivo
+        with HTTP_SESSION.get(TAP_URL, params=params, stream=True, timeout=120) as resp:
+            resp.raise_for_status()
+            resp.raw.decode_content = True
+            if PYARROW_AVAILABLE:
+                # Parser multihilo de pyarrow: una sola pasada por columna, sin la doble
+                # inferencia de tipos del motor C (no admite chunksize)
+                df = pd.read_csv(resp.raw, engine="pyarrow")
+            else:
+                chunks = pd.read_csv(resp.raw, chunksize=TAP_CHUNKSIZE, low_memory=True)
+                df = pd.concat(chunks, ignore_index=True)
         print(f"  -> Tabla '{nombre_tabla}' cargada con {df.shape[0]} filas y {df.shape[1]} columnas.")
+
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        if PYARROW_AVAILABLE:
+            df.to_parquet(ruta, compression="zstd", index=False)
+        else:
+            df.to_pickle(ruta)
         return df
 
     def _construir_dataset_para_ml(self, df, label_col):
         if label_col not in df.columns:
             raise ValueError(f"La columna de etiquetas '{label_col}' no está en el DataFrame.")
+        # pl.from_pandas necesita pyarrow para las columnas de texto
+        if POLARS_AVAILABLE and PYARROW_AVAILABLE:
+            return self._construir_dataset_polars(df, label_col)
         y_raw = df[label_col].astype(str).str.lower()
-        y = y_raw.map(lambda s: "confirmed" if "conf" in s else ("candidate" if "cand" in s else ("false_positive" if "fp" in s or "false" in s else "unknown")))
+        # Etiquetado vectorizado: tres búsquedas de subcadenas en C en lugar de una lambda por fila
+        condiciones = [
+            y_raw.str.contains("conf", regex=False),
+            y_raw.str.contains("cand", regex=False),
+            y_raw.str.contains("fp|false", regex=True),
+        ]
+        y = pd.Series(np.select(condiciones, ["confirmed", "candidate", "false_positive"], default="unknown"),
+                      index=y_raw.index, name=label_col)
         mask = y != "unknown"
-        df, y = df[mask].copy(), y[mask]
-        feature_cols = [c for c in df.columns if any(k in c.lower() for k in ["period", "dur", "depth", "rad", "mass", "a", "st_"])]
-        X = df[feature_cols].apply(pd.to_numeric, errors="coerce")
-        X = X.loc[:, X.isna().mean() < 0.5]
-        imputer = SimpleImputer(strategy="median")
-        return pd.DataFrame(imputer.fit_transform(X), columns=X.columns, index=X.index), y
-
-    def _run(self, mission: str) -> Dict:
+        y = y[mask].astype(LABEL_DTYPE)
+        feature_cols = [c for c in df.columns if es_columna_de_caracteristicas(c)]
+        # Filas y columnas en una sola selección: sin copiar antes la tabla entera
+        X = df.loc[mask, feature_cols].apply(pd.to_numeric, errors="coerce")
+        # float32: precisión de sobra para periodos, radios o magnitudes y la mitad
+        # de memoria para la imputación, el guardado y el entrenamiento posterior
+        # DataFrame.count cuenta los no nulos por columna sin materializar la máscara booleana N×M
+        X = X.loc[:, X.count(axis=0) > 0.5 * len(X)].astype(np.float32)
+        # Imputación por mediana directamente en NumPy: una copia del array y un
+        # nanmedian por columna, sin la validación y las copias extra de SimpleImputer
+        arr = X.to_numpy(dtype=np.float32, copy=True)
+        if arr.size:
+            med = np.nanmedian(arr, axis=0)
+            filas, cols = np.where(np.isnan(arr))
+            arr[filas, cols] = np.take(med, cols)
+        return pd.DataFrame(arr, columns=X.columns, index=X.index), y
+
+    def _construir_dataset_polars(self, df, label_col):
+        """
+        Misma transformación que _construir_dataset_para_ml, como una única
+        consulta LazyFrame de Polars: etiquetado, filtro y conversión numérica se
+        ejecutan en un solo pase multihilo en lugar de varios pases de pandas.
+        """
+        feature_cols = [c for c in df.columns if es_columna_de_caracteristicas(c)]
+        etiqueta = pl.col(label_col).cast(pl.Utf8).str.to_lowercase()
+
+        # Las columnas object pueden mezclar números y texto (según el bloque del
+        # CSV en que se infirió su tipo): se pasan a texto manteniendo los nulos
+        objetos = df.select_dtypes(include="object").columns
+        df = df.assign(**{c: df[c].astype(str).where(df[c].notna()) for c in objetos})
+
+        datos = (
+            pl.from_pandas(df.reset_index(names="__index"))
+            .lazy()
+            .with_columns(
+                pl.when(etiqueta.str.contains("conf", literal=True)).then(pl.lit("confirmed"))
+                .when(etiqueta.str.contains("cand", literal=True)).then(pl.lit("candidate"))
+                .when(etiqueta.str.contains("fp|false")).then(pl.lit("false_positive"))
+                .otherwise(pl.lit("unknown"))
+                .alias("__y")
+            )
+            .filter(pl.col("__y") != "unknown")
+            .select([pl.col("__index"), pl.col("__y")] + [pl.col(c).cast(pl.Float64, strict=False).cast(pl.Float32) for c in feature_cols])
+            .collect()
+        )
+
+        # Columnas con más de un 50% de valores no nulos, imputadas con su mediana.
+        # Mismo criterio que la ruta de pandas: sin filas no se conserva ninguna columna
+        nulos = datos.select(feature_cols).null_count().row(0) if feature_cols else ()
+        columnas = [c for c, n in zip(feature_cols, nulos) if datos.height - n > 0.5 * datos.height]
+        X_pl = datos.select([pl.col(c).fill_null(pl.col(c).median()) for c in columnas])
+
+        index = pd.Index(datos["__index"].to_numpy())
+        X = pd.DataFrame(X_pl.to_numpy(), columns=columnas, index=index)
+        y = pd.Series(datos["__y"].to_numpy(), index=index, name=label_col).astype(LABEL_DTYPE)
+        return X, y
+
+    def _run(self, mission: Optional[str] = None, format: str = "parquet", missions: Optional[List[str]] = None) -> Dict:
+        if missions:
+            datasets = self._run_all(missions, format=format)
+            ok = [m for m, r in datasets.items() if r.get("status") == "success"]
+            summary = f"Datasets creados para {len(ok)} de {len(datasets)} misiones."
+            return {"status": "success" if ok else "error", "summary": summary, "datasets": datasets}
+        if mission is None:
+            return {"error": "Indica una misión en 'mission' o una lista en 'missions'."}
+        return self._run_mision(mission, format=format)
+
+    def _run_mision(self, mission: str, format: str = "parquet") -> Dict:
         try:
             print(f"--- TOOL: Creando dataset de ML para la misión {mission}... ---")
-            tablas = {"Kepler": ("cumulative", "koi_disposition"), "TESS": ("toi", "tfopwg_disp"), "K2": ("k2pandc", "disposition")}
-            if mission not in tablas:
-                return {"error": f"Misión inválida. Usa una de {list(tablas.keys())}"}
+            if mission not in TABLAS_POR_MISION:
+                return {"error": f"Misión inválida. Usa una de {list(TABLAS_POR_MISION.keys())}"}
+            if format not in ("parquet", "csv"):
+                return {"error": "Formato inválido. Usa 'parquet' o 'csv'."}
+            # Sin pyarrow no se puede escribir Parquet: se recurre a CSV
+            if format == "parquet" and not PYARROW_AVAILABLE:
+                format = "csv"
             
-            tabla, etiqueta = tablas[mission]
-            df = self._cargar_datos_nasa(tabla)
+            tabla, etiqueta, disposiciones = TABLAS_POR_MISION[mission]
+            columnas = [etiqueta] + [c for c in columnas_tabla_tap(tabla) if c != etiqueta and es_columna_de_caracteristicas(c)]
+            where = f"{etiqueta} in ({','.join(repr(d) for d in disposiciones)})"
+            df = self._cargar_datos_nasa(tabla, columnas, where=where)
             X, y = self._construir_dataset_para_ml(df, label_col=etiqueta)
             
-            features_path = f"{mission}_ml_features.csv"
-            labels_path = f"{mission}_ml_labels.csv"
-            X.to_csv(features_path)
-            y.to_csv(labels_path)
+            features_path = f"{mission}_ml_features.{format}"
+            labels_path = f"{mission}_ml_labels.{format}"
+            if format == "parquet":
+                # Columnar y comprimido: mucho más pequeño y rápido de escribir y releer que CSV
+                X.to_parquet(features_path, compression="zstd", engine="pyarrow")
+                y.to_frame().to_parquet(labels_path, compression="zstd", engine="pyarrow")
+            else:
+                guardar_csv(X, features_path)
+                guardar_csv(y, labels_path)
             
             summary = f"Dataset para {mission} creado. Características: {X.shape[0]} filas, {X.shape[1]} columnas. Etiquetas: {len(y)}."
             print(f"  -> {summary}")
-            return {"status": "success", "summary": summary, "features_file_path": features_path, "labels_file_path": labels_path}
+            return {
+                "status": "success", "summary": summary,
+                "features_file_path": features_path, "labels_file_path": labels_path,
+                "features_handle": registrar_resultado(X, features_path),
+                "labels_handle": registrar_resultado(y.to_frame(), labels_path),
+            }
         except Exception as e:
             error_message = f"No se pudo construir el dataset para {mission}: {e}"
             print(f"  -> ERROR en {self.name}: {error_message}")
-            return {"error": error_message}
\ No newline at end of file
+            return {"error": error_message}
+
+    def _run_all(self, missions: Optional[List[str]] = None, format: str = "parquet") -> Dict[str, Dict]:
+        """
+        Construye los datasets de varias misiones a la vez (todas por defecto).
+
+        Cada misión espera sobre todo a la descarga TAP y al parser de pyarrow,
+        que liberan el GIL: con un hilo por misión el tiempo total es el de la
+        más lenta en lugar de la suma. Devuelve el resultado de _run_mision por misión.
+        """
+        missions = list(dict.fromkeys(missions or TABLAS_POR_MISION))
+        with ThreadPoolExecutor(max_workers=len(missions)) as ex:
+            resultados = ex.map(lambda mission: self._run_mision(mission, format=format), missions)
+            return dict(zip(missions, resultados))
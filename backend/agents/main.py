@@ -4,15 +4,17 @@ def sanitize_prompt_string(s):
 		return s
 	return s.replace('{error}', '{{error}}')
 
+import asyncio
+
 from ideas_orchestator.generate_ideas import proceso_de_metajuicio
 from conection.conection import prompt_to_llm_engineer
 from llm_exohunter.llm_exohunter import run_ML_Engineer
 from cloud.cloud_constants import models_dict
-from prompt.prompt import system 
+from prompt.prompts_compiled import SYSTEM as system
 
 '''system = sanitize_prompt_string(system)
 
-final_conclusion = proceso_de_metajuicio(models_dict, system, 1, 1, 2)
+final_conclusion = asyncio.run(proceso_de_metajuicio(models_dict, system, 1, 1, 2))
 final_conclusion = sanitize_prompt_string(final_conclusion)
 
 prompt_to_llm_engineer = prompt_to_llm_engineer(final_conclusion)
@@ -0,0 +1,39 @@
+'''
+Genera prompt/prompts_compiled.py a partir de SYSTEM.txt, HUMAN.txt y PROMPT_JUICIO.txt.
+
+Los prompts quedan como literales de Python, así que al importarlos se usa el
+bytecode cacheado en __pycache__ en lugar de abrir tres ficheros de texto.
+Hay que volver a ejecutarlo cada vez que se edite uno de los .txt:
+
+    python prompt/compile_prompts.py
+'''
+
+from pathlib import Path
+
+AGENTS_DIR = Path(__file__).resolve().parent.parent
+SALIDA = Path(__file__).resolve().parent / "prompts_compiled.py"
+
+# Nombre de la constante -> fichero de origen (relativo a backend/agents)
+PROMPTS = {
+    "SYSTEM": "SYSTEM.txt",
+    "HUMAN": "HUMAN.txt",
+    "PROMPT_JUICIO": "PROMPT_JUICIO.txt",
+}
+
+
+def compilar_prompts(salida=SALIDA):
+    lineas = [
+        "# Fichero generado por prompt/compile_prompts.py; no editar a mano.",
+        "# Editar los .txt de backend/agents y volver a ejecutar el script.",
+        "",
+    ]
+    for nombre, fichero in PROMPTS.items():
+        texto = (AGENTS_DIR / fichero).read_text(encoding="utf-8")
+        lineas.append(f"{nombre} = {texto!r}")
+        lineas.append("")
+    Path(salida).write_text("\n".join(lineas), encoding="utf-8")
+    return salida
+
+
+if __name__ == "__main__":
+    print(f"Prompts compilados en {compilar_prompts()}")
@@ -1,19 +0,0 @@
-system = '''
-You are an expert in AI, astronomy, and exoplanet hunting using the latest machine learning and artificial intelligence 
-technologies
-'''
-
-human = '''
-Naturally, the main way in which exoplanets are “hunted” is through the analysis of the light intensity emitted by stars,
-from which we can obtain data and intensity/time graphs. These can be labeled or unlabeled, and are used to train models 
-so that they can learn to perform the assigned task. I would therefore like you to take on the task of generating original 
-and innovative ideas for AI models that, trained solely on this type of data, could be used in exoplanet detection. I want 
-you to come up with ideas that could become SOTA models, and to show how, using only one GPU and the libraries lightkurve 
-and astroquery, we could build an MVP of the new ML model and/or architecture with viable and promising results that 
-demonstrate true potential for SOTA performance. With these resource constraints, would it be possible to create a fully 
-functional MVP? Keep in mind that this is for the NASA Space Apps Challenge, so we only have two days of intensive coding 
-to test ideas and build MVPs. How many MVPs would you recommend developing in these two days in order to test candidates 
-and present those with the greatest potential to produce promising ML models that could reach SOTA? Remember that we want 
-to win the international award and achieve something far more novel than any other team taking on this challenge. Focus 
-mainly on the generation and refinement of ideas, not on writing code, in your next response. Remember that the model 
-will be trained only on light intensity/time data for identification.'''
\ No newline at end of file
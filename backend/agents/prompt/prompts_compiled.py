@@ -0,0 +1,8 @@
+# Fichero generado por prompt/compile_prompts.py; no editar a mano.
+# Editar los .txt de backend/agents y volver a ejecutar el script.
+
+SYSTEM = 'You are an expert in AI, astronomy, and exoplanet hunting using the latest machine learning and artificial intelligence technologies'
+
+HUMAN = 'Naturally, the main way in which exoplanets are “hunted” is through the analysis of the light intensity emitted by stars, from which we can obtain data and intensity/time graphs. These can be labeled or unlabeled, and are used to train models so that they can learn to perform the assigned task. I would therefore like you to take on the task of generating original and innovative ideas for AI models that, trained solely on this type of data, could be used in exoplanet detection. I want you to come up with ideas that could become SOTA models, and to show how, using only one GPU and the libraries lightkurve and astroquery, we could build an MVP of the new ML model and/or architecture with viable and promising results that demonstrate true potential for SOTA performance. With these resource constraints, would it be possible to create a fully functional MVP? Keep in mind that this is for the NASA Space Apps Challenge, so we only have two days of intensive coding to test ideas and build MVPs. How many MVPs would you recommend developing in these two days in order to test candidates and present those with the greatest potential to produce promising ML models that could reach SOTA? Remember that we want to win the international award and achieve something far more novel than any other team taking on this challenge. Focus mainly on the generation and refinement of ideas, not on writing code, in your next response. Remember that the model will be trained only on light intensity/time data for identification.\n'
+
+PROMPT_JUICIO = 'You are an expert judge in AI and astronomy for the NASA Space Apps Challenge.\nYour task is to analyze and evaluate the following {X} final ideas that have been generated and refined.\nAssess them according to the following criteria:\n\n1. **Innovation and Originality**: How novel is the idea compared to current methods?\n2. **MVP Feasibility**: Is it realistic to develop a convincing prototype in just 2 days with a single GPU and the lightkurve/astroquery libraries?\n3. **SOTA Potential**: Which of these ideas has the greatest long-term potential to become a benchmark in exoplanet hunting?\n\nProvide a clear verdict, comparing the ideas with each other and recommending which one should be chosen for the hackathon.\nEnd your answer with a single line that starts with "VEREDICTO FINAL:" followed by the winning idea.\n\nHere are the ideas to evaluate:\n{ideas_to_evaluate}\n'
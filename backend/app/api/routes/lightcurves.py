@@ -2,7 +2,9 @@
 API routes for light curves
 """
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import ORJSONResponse
 from typing import Optional
+import numpy as np
 
 from app.models.schemas import LightCurveResponse
 from app.services.lightkurve_service import lightkurve_service
@@ -10,7 +12,7 @@ from app.services.lightkurve_service import lightkurve_service
 router = APIRouter()
 
 
-@router.get("/{star_id}", response_model=LightCurveResponse)
+@router.get("/{star_id}", response_model=LightCurveResponse, response_class=ORJSONResponse)
 async def get_lightcurve(
     star_id: str,
     mission: Optional[str] = Query("TESS", description="Mission (TESS, Kepler, K2)"),
@@ -30,7 +32,10 @@ async def get_lightcurve(
             # In a full implementation, you'd apply these filters here
             pass
         
-        return LightCurveResponse(**lightcurve_data)
+        # The service payload already has the LightCurveResponse shape: orjson writes
+        # its numpy arrays straight from their buffers, with no pydantic pass or
+        # Python float lists in between (response_model still feeds the OpenAPI schema)
+        return ORJSONResponse(content=lightcurve_data)
         
     except HTTPException:
         raise
@@ -60,7 +65,7 @@ async def download_lightcurve_csv(
         
         # Write header
         headers = ["time", "flux"]
-        if lightcurve_data["data"].get("flux_err"):
+        if lightcurve_data["data"].get("flux_err") is not None:
             headers.append("flux_err")
         writer.writerow(headers)
         
@@ -71,7 +76,7 @@ async def download_lightcurve_csv(
         
         for i in range(len(time_data)):
             row = [time_data[i], flux_data[i]]
-            if flux_err_data:
+            if flux_err_data is not None:
                 row.append(flux_err_data[i])
             writer.writerow(row)
         
@@ -101,21 +106,24 @@ async def get_lightcurve_metadata(
         if not lightcurve_data:
             raise HTTPException(status_code=404, detail=f"No light curve data found for star '{star_id}'")
         
+        time_data = lightcurve_data["data"]["time"]
+        flux_data = lightcurve_data["data"]["flux"]
+        
         return {
             "star_id": lightcurve_data["star_id"],
             "star_name": lightcurve_data["star_name"],
             "mission": lightcurve_data["mission"],
             "metadata": lightcurve_data["metadata"],
             "data_info": {
-                "total_points": len(lightcurve_data["data"]["time"]),
+                "total_points": len(time_data),
                 "cadence": lightcurve_data["data"]["cadence"],
                 "time_range": {
-                    "start": min(lightcurve_data["data"]["time"]) if lightcurve_data["data"]["time"] else None,
-                    "end": max(lightcurve_data["data"]["time"]) if lightcurve_data["data"]["time"] else None
+                    "start": float(np.min(time_data)) if len(time_data) else None,
+                    "end": float(np.max(time_data)) if len(time_data) else None
                 },
                 "flux_range": {
-                    "min": min(lightcurve_data["data"]["flux"]) if lightcurve_data["data"]["flux"] else None,
-                    "max": max(lightcurve_data["data"]["flux"]) if lightcurve_data["data"]["flux"] else None
+                    "min": float(np.min(flux_data)) if len(flux_data) else None,
+                    "max": float(np.max(flux_data)) if len(flux_data) else None
                 }
             }
         }
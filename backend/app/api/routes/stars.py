@@ -2,10 +2,11 @@
 API routes for stars
 """
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import JSONResponse
 from typing import List, Optional
 
 from app.models.schemas import StarInfo, StarSearch
-from app.services.lightkurve_service import lightkurve_service
+from app.services.lightkurve_service import ID_RE, lightkurve_service
 
 router = APIRouter()
 
@@ -18,12 +19,11 @@ async def search_stars(
 ):
     """Search for stars/targets"""
     try:
-        targets = await lightkurve_service.search_targets(query, mission)
+        targets = await lightkurve_service.search_targets(query, mission, limit=limit)
         
-        # Convert to StarInfo models
-        star_list = []
-        for target in targets[:limit]:
-            star_info = StarInfo(
+        # The service already builds typed, validated dicts: skip re-validation
+        stars = [
+            StarInfo.model_construct(
                 id=target["id"],
                 name=target["name"],
                 ra=target.get("ra"),
@@ -32,9 +32,12 @@ async def search_stars(
                 mission=target["mission"],
                 has_lightcurve=target["has_lightcurve"]
             )
-            star_list.append(star_info)
+            for target in targets
+        ]
         
-        return star_list
+        # Returning a Response directly also skips FastAPI's second validation
+        # pass against response_model (still used for the OpenAPI schema)
+        return JSONResponse(content=[star.model_dump() for star in stars])
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error searching stars: {str(e)}")
@@ -44,14 +47,17 @@ async def search_stars(
 async def get_star_details(star_id: str):
     """Get details for a specific star"""
     try:
-        # For now, search for the star to get its details
-        targets = await lightkurve_service.search_targets(star_id)
+        # Catalog IDs resolve with one exact query instead of a fuzzy MAST search
+        target = None
+        if ID_RE.match(star_id):
+            target = await lightkurve_service.lookup_by_id(star_id)
         
-        if not targets:
-            raise HTTPException(status_code=404, detail=f"Star '{star_id}' not found")
+        if target is None:
+            # Only the first hit is used, so stop at the fastest mission that has one
+            target = await lightkurve_service.first_match(star_id)
         
-        # Return the first match
-        target = targets[0]
+        if target is None:
+            raise HTTPException(status_code=404, detail=f"Star '{star_id}' not found")
         return {
             "id": target["id"],
             "name": target["name"],
@@ -2,14 +2,15 @@
 WebSocket API routes for real-time ML model communication.
 """
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException
+from pydantic import ValidationError
 import logging
-import json
 import asyncio
 from typing import Dict, Any, Optional
 
 from app.websockets import manager
+from app.utils import json_utils
 from app.services.ml_websocket_service import MLWebSocketService
-from app.models.schemas import MLClassificationRequest
+from app.models.schemas import MLClassificationRequest, MLWebSocketMessage
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -17,6 +18,22 @@ logger = logging.getLogger(__name__)
 # Create ML service instance
 ml_service = MLWebSocketService()
 
+# Constant replies, serialized once instead of on every message
+PONG_MESSAGE = json_utils.dumps({"type": "pong"})
+ALL_STOPPED_MESSAGE = json_utils.dumps({"type": "stream_status", "status": "all_stopped"})
+INVALID_JSON_MESSAGE = json_utils.dumps({"type": "error", "message": "Invalid JSON format"})
+
+# Parameterized error replies: prebuilt prefix + escaped detail + suffix
+ERROR_PROCESSING_PREFIX = '{"type":"error","message":"Error processing message: '
+INVALID_MESSAGE_PREFIX = '{"type":"error","message":"Invalid message: '
+UNSUPPORTED_TYPE_PREFIX = '{"type":"error","message":"Unsupported message type: '
+ERROR_SUFFIX = '"}'
+
+
+def _error_frame(prefix: str, detail: Any) -> str:
+    """Complete a prebuilt error reply; only the dynamic detail gets JSON-escaped"""
+    return prefix + json_utils.dumps(str(detail))[1:-1] + ERROR_SUFFIX
+
 
 @router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
@@ -26,36 +43,22 @@ async def websocket_endpoint(websocket: WebSocket):
         while True:
             data = await websocket.receive_text()
             try:
-                message = json.loads(data)
-                message_type = message.get("type", "unknown")
-                
-                if message_type == "ping":
-                    await manager.send_personal_message({"type": "pong"}, websocket)
-                elif message_type == "ml_request":
-                    # Handle ML model request separately
-                    await handle_ml_request(websocket, message)
-                else:
-                    # Echo back the message as a default behavior
-                    await manager.send_personal_message(
-                        {"type": "echo", "content": message},
-                        websocket
-                    )
-            except json.JSONDecodeError:
-                await manager.send_personal_message(
-                    {"type": "error", "message": "Invalid JSON format"},
-                    websocket
-                )
+                message = json_utils.loads(data)
+                # One dict lookup picks the handler; unknown types are echoed back
+                handler = GENERAL_HANDLERS.get(message.get("type", "unknown"), _handle_echo)
+                await handler(websocket, message)
+            except json_utils.JSONDecodeError:
+                await manager.send_raw(websocket, INVALID_JSON_MESSAGE)
             except Exception as e:
                 logger.error(f"Error processing message: {str(e)}")
-                await manager.send_personal_message(
-                    {"type": "error", "message": f"Error processing message: {str(e)}"},
-                    websocket
-                )
+                await manager.send_raw(websocket, _error_frame(ERROR_PROCESSING_PREFIX, e))
     except WebSocketDisconnect:
         manager.disconnect(websocket, "general")
     except Exception as e:
         logger.error(f"WebSocket error: {str(e)}")
         manager.disconnect(websocket, "general")
+        # The socket is still open: let the replies already queued go out
+        await manager.flush(websocket)
 
 
 @router.websocket("/ws/ml/{model_type}")
@@ -80,43 +83,29 @@ async def ml_websocket_endpoint(websocket: WebSocket, model_type: str):
         while True:
             data = await websocket.receive_text()
             try:
-                message = json.loads(data)
-                message_type = message.get("type", "unknown")
-                
-                if message_type == "ping":
-                    await manager.send_personal_message({"type": "pong"}, websocket)
-                elif message_type == "start_stream":
-                    # Start streaming predictions from the ML model
-                    await start_ml_stream(websocket, model_type, message)
-                elif message_type == "stop_stream":
-                    # Stop any active streams for this client
-                    await stop_ml_stream(websocket, message)
-                elif message_type == "classify":
-                    # Process a single classification request
-                    await handle_classification(websocket, model_type, message)
+                # pydantic-core parses the JSON text straight into the typed model,
+                # without building an intermediate dict first
+                message = MLWebSocketMessage.model_validate_json(data)
+                handler = ML_HANDLERS.get(message.type, _handle_unsupported)
+                await handler(websocket, model_type, message)
+            except ValidationError as e:
+                if any(error["type"] == "json_invalid" for error in e.errors()):
+                    await manager.send_raw(websocket, INVALID_JSON_MESSAGE)
                 else:
-                    await manager.send_personal_message(
-                        {"type": "error", "message": f"Unsupported message type: {message_type}"},
-                        websocket
-                    )
-            except json.JSONDecodeError:
-                await manager.send_personal_message(
-                    {"type": "error", "message": "Invalid JSON format"},
-                    websocket
-                )
+                    await manager.send_raw(websocket, _error_frame(INVALID_MESSAGE_PREFIX, e))
             except Exception as e:
                 logger.error(f"Error processing ML message: {str(e)}")
-                await manager.send_personal_message(
-                    {"type": "error", "message": f"Error processing message: {str(e)}"},
-                    websocket
-                )
+                await manager.send_raw(websocket, _error_frame(ERROR_PROCESSING_PREFIX, e))
     except WebSocketDisconnect:
-        manager.disconnect(websocket, "ml_model")
         await ml_service.stop_stream_for_client(websocket)
+        manager.disconnect(websocket, "ml_model")
     except Exception as e:
         logger.error(f"ML WebSocket error: {str(e)}")
-        manager.disconnect(websocket, "ml_model")
+        # Streams are stopped first so their "cancelled" frames are queued
+        # before the writer is told to flush and stop
         await ml_service.stop_stream_for_client(websocket)
+        manager.disconnect(websocket, "ml_model")
+        await manager.flush(websocket)
 
 
 async def handle_ml_request(websocket: WebSocket, message: Dict[str, Any]):
@@ -163,10 +152,10 @@ async def handle_ml_request(websocket: WebSocket, message: Dict[str, Any]):
         )
 
 
-async def start_ml_stream(websocket: WebSocket, model_type: str, message: Dict[str, Any]):
+async def start_ml_stream(websocket: WebSocket, model_type: str, message: MLWebSocketMessage):
     """Start streaming ML predictions"""
-    stream_id = message.get("stream_id", f"stream_{id(websocket)}")
-    parameters = message.get("parameters", {})
+    stream_id = message.stream_id or f"stream_{id(websocket)}"
+    parameters = message.parameters
     
     try:
         # Start streaming process with the ML service
@@ -199,17 +188,14 @@ async def start_ml_stream(websocket: WebSocket, model_type: str, message: Dict[s
         )
 
 
-async def stop_ml_stream(websocket: WebSocket, message: Dict[str, Any]):
+async def stop_ml_stream(websocket: WebSocket, message: MLWebSocketMessage):
     """Stop an active ML prediction stream"""
-    stream_id = message.get("stream_id", None)
+    stream_id = message.stream_id
     
     if not stream_id:
         # If no specific stream ID, stop all streams for this client
         await ml_service.stop_stream_for_client(websocket)
-        await manager.send_personal_message(
-            {"type": "stream_status", "status": "all_stopped"},
-            websocket
-        )
+        await manager.send_raw(websocket, ALL_STOPPED_MESSAGE)
     else:
         # Stop specific stream
         stopped = await ml_service.stop_stream(stream_id, websocket)
@@ -223,15 +209,14 @@ async def stop_ml_stream(websocket: WebSocket, message: Dict[str, Any]):
         )
 
 
-async def handle_classification(websocket: WebSocket, model_type: str, message: Dict[str, Any]):
+async def handle_classification(websocket: WebSocket, model_type: str, message: MLWebSocketMessage):
     """Process a single classification request"""
-    request_id = message.get("request_id", "unknown")
-    features = message.get("features", {})
+    request_id = message.request_id
     
     try:
-        # Create request
+        # Features are only validated here, where they are used
         ml_request = MLClassificationRequest(
-            features=features,
+            features=message.features,
             model_type=model_type
         )
         
@@ -260,4 +245,41 @@ async def handle_classification(websocket: WebSocket, model_type: str, message:
                 "message": f"Classification error: {str(e)}"
             },
             websocket
-        )
\ No newline at end of file
+        )
+
+
+async def _handle_ping(websocket: WebSocket, *args):
+    """Answer a ping"""
+    await manager.send_raw(websocket, PONG_MESSAGE)
+
+
+async def _handle_echo(websocket: WebSocket, message: Dict[str, Any]):
+    """Echo back the message as a default behavior"""
+    await manager.send_personal_message(
+        {"type": "echo", "content": message},
+        websocket
+    )
+
+
+async def _handle_stop_stream(websocket: WebSocket, model_type: str, message: MLWebSocketMessage):
+    """Stop any active streams for this client"""
+    await stop_ml_stream(websocket, message)
+
+
+async def _handle_unsupported(websocket: WebSocket, model_type: str, message: MLWebSocketMessage):
+    """Reject a message type the ML endpoint doesn't know"""
+    await manager.send_raw(websocket, _error_frame(UNSUPPORTED_TYPE_PREFIX, message.type))
+
+
+# Message type -> handler, built once at import instead of an if/elif chain per frame
+GENERAL_HANDLERS = {
+    "ping": _handle_ping,
+    "ml_request": handle_ml_request,
+}
+
+ML_HANDLERS = {
+    "ping": _handle_ping,
+    "start_stream": start_ml_stream,
+    "stop_stream": _handle_stop_stream,
+    "classify": handle_classification,
+}
@@ -5,19 +5,16 @@ Este módulo centraliza toda la configuración de la aplicación, incluyendo:
 - Configuración de API y servidor
 - APIs externas (NASA, MAST)
 - Configuración CORS y rate limiting
-- Carga de variables de entorno desde .env
-- Inicialización del cliente S3
+- Carga de variables de entorno desde .env (una sola vez, vía pydantic-settings)
+- Inicialización perezosa del cliente S3 (en el primer uso)
 - Configuraciones generales de la aplicación
 """
 
-import os
 import logging
+import threading
+from functools import lru_cache
 from typing import List
 from pydantic_settings import BaseSettings
-from dotenv import load_dotenv
-
-# Cargar variables de entorno desde .env al inicio de la aplicación
-load_dotenv()
 
 # Configuración del logging
 logging.basicConfig(
@@ -52,6 +49,23 @@ class Settings(BaseSettings):
     
     # Cache Settings
     cache_ttl_seconds: int = 3600
+
+    # Caché persistente en disco (diskcache) compartida entre workers y reinicios
+    disk_cache_dir: str = "data/cache/services"
+    disk_cache_ttl_seconds: int = 86400
+    disk_cache_size_limit: int = 2**32
+
+    # Directorio de descargas FITS de lightkurve (vacío = el predeterminado, ~/.lightkurve/cache)
+    lightkurve_cache_dir: str = ""
+
+    # Descarga inicial de datos de la NASA en segundo plano al arrancar el servidor
+    startup_data_init: bool = False
+
+    # WebSockets: máximo de mensajes ya encolados que se envían juntos en un solo frame
+    ws_send_batch_size: int = 128
+    # WebSockets: máximo de mensajes pendientes de envío por conexión; un cliente
+    # que no lee y llena su cola se desconecta para no acumular memoria
+    ws_send_queue_size: int = 256
     
     # Logging
     log_level: str = "INFO"
@@ -67,22 +81,78 @@ class Settings(BaseSettings):
         case_sensitive = False
 
 
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Devuelve la configuración de la aplicación.
+
+    pydantic-settings ya lee el archivo .env, por lo que el entorno se
+    parsea una única vez por proceso y el resultado se reutiliza.
+    """
+    return Settings()
+
+
 # Instancia global de configuración
-settings = Settings()
+settings = get_settings()
 
-# Inicializar cliente S3 único para toda la aplicación
-try:
-    from app.services.s3_service import S3Client
-    
-    logger.info("Inicializando cliente S3...")
-    s3_client = S3Client(
-        aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-        aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-        aws_region=os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
-    )
-    logger.info("Cliente S3 inicializado exitosamente")
-    
-except Exception as e:
-    logger.error(f"Error al inicializar cliente S3: {str(e)}")
-    logger.warning("La aplicación continuará sin funcionalidad S3")
-    s3_client = None
\ No newline at end of file
+# Cliente S3 único para toda la aplicación (singleton protegido por lock)
+_s3_lock = threading.Lock()
+_s3_singleton = None
+_s3_initialized = False
+
+
+def _create_s3_client():
+    """Construye el cliente S3 a partir de la configuración; None si falla."""
+    try:
+        from app.services.s3_service import S3Client
+
+        logger.info("Inicializando cliente S3...")
+        client = S3Client(
+            aws_access_key_id=settings.aws_access_key_id,
+            aws_secret_access_key=settings.aws_secret_access_key,
+            aws_region=settings.aws_default_region
+        )
+        logger.info("Cliente S3 inicializado exitosamente")
+        return client
+
+    except Exception as e:
+        logger.error(f"Error al inicializar cliente S3: {str(e)}")
+        logger.warning("La aplicación continuará sin funcionalidad S3")
+        return None
+
+
+def get_s3_client():
+    """
+    Devuelve el cliente S3 compartido, creándolo la primera vez.
+
+    Usa double-checked locking para que varios hilos que lleguen a la vez
+    no inicialicen el cliente más de una vez.
+    """
+    global _s3_singleton, _s3_initialized
+    if not _s3_initialized:
+        with _s3_lock:
+            if not _s3_initialized:
+                _s3_singleton = _create_s3_client()
+                _s3_initialized = True
+    return _s3_singleton
+
+
+class _LazyS3Client:
+    """
+    Proxy del cliente S3 compartido que lo crea en el primer acceso a un atributo.
+
+    Así importar la configuración (tests, scripts, subprocesos de --reload de
+    uvicorn) no espera a la inicialización de boto3.
+    """
+
+    def __getattr__(self, name):
+        client = get_s3_client()
+        if client is None:
+            raise AttributeError(f"Cliente S3 no disponible; no se puede acceder a '{name}'")
+        return getattr(client, name)
+
+    def __bool__(self) -> bool:
+        return get_s3_client() is not None
+
+
+s3_client = _LazyS3Client()
@@ -101,78 +101,82 @@ class DataExtractor:
     
     async def extract_popular_lightcurves(self, targets: List[str], mission: str = "TESS") -> Dict[str, str]:
         """Extract light curves for popular targets"""
-        mission_dir = self.raw_dir / mission.lower()
-        results = {}
-        
         logger.info(f"Downloading light curves for {len(targets)} targets from {mission}")
         
-        if not ASTRO_LIBS_AVAILABLE:
-            logger.warning("Lightkurve not available, creating mock light curves")
-            for target in targets:
-                mock_file = await self._create_mock_lightcurve(target, mission, mission_dir)
-                results[target] = mock_file
-            return results
-        
         # Download light curves concurrently (but limited)
         semaphore = asyncio.Semaphore(3)  # Limit concurrent downloads
         
         async def download_single(target: str):
             async with semaphore:
-                try:
-                    loop = asyncio.get_event_loop()
-                    
-                    # Search and download
-                    search_result = await loop.run_in_executor(
-                        None,
-                        lambda: lk.search_lightcurve(target, mission=mission.upper())
-                    )
-                    
-                    if len(search_result) > 0:
-                        lc_collection = await loop.run_in_executor(
-                            None,
-                            lambda: search_result.download_all(quality_bitmask='hardest')
-                        )
-                        
-                        if len(lc_collection) > 0:
-                            lc = await loop.run_in_executor(
-                                None,
-                                lambda: lc_collection.stitch().remove_nans()
-                            )
-                            
-                            # Save as FITS and CSV
-                            target_clean = target.replace(" ", "_").replace("-", "_")
-                            fits_file = mission_dir / f"{target_clean}_lightcurve.fits"
-                            csv_file = mission_dir / f"{target_clean}_lightcurve.csv"
-                            
-                            # Save FITS
-                            await loop.run_in_executor(None, lambda: lc.to_fits(fits_file))
-                            
-                            # Save CSV
-                            lc_data = {
-                                'time': lc.time.value,
-                                'flux': lc.flux.value,
-                                'flux_err': lc.flux_err.value if hasattr(lc, 'flux_err') else None
-                            }
-                            df = pd.DataFrame(lc_data)
-                            await loop.run_in_executor(None, lambda: df.to_csv(csv_file, index=False))
-                            
-                            results[target] = str(csv_file)
-                            logger.info(f"Downloaded light curve for {target}")
-                            return
-                
-                except Exception as e:
-                    logger.error(f"Error downloading {target}: {str(e)}")
-                
-                # Fallback to mock data
-                mock_file = await self._create_mock_lightcurve(target, mission, mission_dir)
-                results[target] = mock_file
+                return await self.extract_lightcurve(target, mission)
         
         # Execute downloads
-        await asyncio.gather(*[download_single(target) for target in targets])
+        paths = await asyncio.gather(*[download_single(target) for target in targets])
+        results = dict(zip(targets, paths))
         
         logger.info(f"Completed downloading {len(results)} light curves")
         return results
     
+    async def extract_lightcurve(self, target: str, mission: str = "TESS") -> str:
+        """
+        Extract the light curve of a single target
+        
+        Falls back to mock data when the download fails. Callers bound the
+        concurrency (e.g. with a semaphore) when downloading many targets.
+        """
+        mission_dir = self.raw_dir / mission.lower()
+        
+        if not ASTRO_LIBS_AVAILABLE:
+            logger.warning("Lightkurve not available, creating mock light curve")
+            return await self._create_mock_lightcurve(target, mission, mission_dir)
+        
+        try:
+            loop = asyncio.get_event_loop()
+            
+            # Search and download
+            search_result = await loop.run_in_executor(
+                None,
+                lambda: lk.search_lightcurve(target, mission=mission.upper())
+            )
+            
+            if len(search_result) > 0:
+                lc_collection = await loop.run_in_executor(
+                    None,
+                    lambda: search_result.download_all(quality_bitmask='hardest')
+                )
+                
+                if len(lc_collection) > 0:
+                    lc = await loop.run_in_executor(
+                        None,
+                        lambda: lc_collection.stitch().remove_nans()
+                    )
+                    
+                    # Save as FITS and CSV
+                    target_clean = target.replace(" ", "_").replace("-", "_")
+                    fits_file = mission_dir / f"{target_clean}_lightcurve.fits"
+                    csv_file = mission_dir / f"{target_clean}_lightcurve.csv"
+                    
+                    # Save FITS
+                    await loop.run_in_executor(None, lambda: lc.to_fits(fits_file))
+                    
+                    # Save CSV
+                    lc_data = {
+                        'time': lc.time.value,
+                        'flux': lc.flux.value,
+                        'flux_err': lc.flux_err.value if hasattr(lc, 'flux_err') else None
+                    }
+                    df = pd.DataFrame(lc_data)
+                    await loop.run_in_executor(None, lambda: df.to_csv(csv_file, index=False))
+                    
+                    logger.info(f"Downloaded light curve for {target}")
+                    return str(csv_file)
+        
+        except Exception as e:
+            logger.error(f"Error downloading {target}: {str(e)}")
+        
+        # Fallback to mock data
+        return await self._create_mock_lightcurve(target, mission, mission_dir)
+    
     async def extract_mission_summary(self, mission: str) -> str:
         """Extract summary statistics for a specific mission"""
         summary_file = self.processed_dir / f"{mission.lower()}_summary.json"
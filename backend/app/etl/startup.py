@@ -3,20 +3,42 @@ Startup script that pre-downloads popular datasets when the server starts
 """
 import asyncio
 import logging
+import os
 from typing import List
 from pathlib import Path
 
+from cachetools import TTLCache
+
 from app.etl.extract import data_extractor
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
 
+def _count_files(dirpath: Path, suffix: str) -> int:
+    """Count the files in a directory whose name ends with suffix (0 if it doesn't exist)"""
+    try:
+        with os.scandir(dirpath) as entries:
+            return sum(1 for entry in entries if entry.name.endswith(suffix))
+    except FileNotFoundError:
+        return 0
+
+
 class DataStartupService:
     """Service to pre-load popular datasets at startup"""
     
+    # Maximum light curve downloads in flight at once
+    MAX_CONCURRENT_DOWNLOADS = 8
+    
+    # Name fragments used to split the popular targets between missions
+    TESS_NAME_HINTS = ("TOI", "WASP", "HD", "TRAPPIST", "GJ", "HAT")
+    KEPLER_NAME_HINTS = ("Kepler", "KOI", "KIC")
+    
     def __init__(self):
         self.startup_complete = False
+        # Data files on disk for the status endpoint: refreshed after each
+        # initialization and otherwise at most every 5 seconds of polling
+        self._status_cache = TTLCache(maxsize=1, ttl=5)
         self.popular_targets = [
             # Famous exoplanets for TESS
             "TOI-715 b",
@@ -42,6 +64,12 @@ class DataStartupService:
             "Kepler-16 b",
             "Kepler-90 h"
         ]
+        
+        # Mission of each popular target, classified once by name
+        self.targets_by_mission = {
+            "TESS": [t for t in self.popular_targets if any(x in t for x in self.TESS_NAME_HINTS)],
+            "Kepler": [t for t in self.popular_targets if any(x in t for x in self.KEPLER_NAME_HINTS)],
+        }
     
     async def initialize_data(self) -> bool:
         """Initialize popular datasets at startup"""
@@ -64,6 +92,7 @@ class DataStartupService:
             
             # Mark as complete even if some tasks failed
             self.startup_complete = True
+            self._refresh_status_cache()
             logger.info("Data initialization completed")
             
             return len(failed_tasks) == 0
@@ -86,25 +115,32 @@ class DataStartupService:
     async def _download_popular_lightcurves(self):
         """Download light curves for popular targets"""
         try:
-            # Split targets between missions
-            tess_targets = [t for t in self.popular_targets if any(x in t for x in ["TOI", "WASP", "HD", "TRAPPIST", "GJ", "HAT"])]
-            kepler_targets = [t for t in self.popular_targets if any(x in t for x in ["Kepler", "KOI", "KIC"])]
-            
-            # Download TESS light curves
-            if tess_targets:
-                tess_results = await data_extractor.extract_popular_lightcurves(
-                    targets=tess_targets[:10],  # Limit to avoid long startup
-                    mission="TESS"
-                )
-                logger.info(f"Downloaded {len(tess_results)} TESS light curves")
-            
-            # Download Kepler light curves  
-            if kepler_targets:
-                kepler_results = await data_extractor.extract_popular_lightcurves(
-                    targets=kepler_targets[:10],  # Limit to avoid long startup
-                    mission="Kepler"
-                )
-                logger.info(f"Downloaded {len(kepler_results)} Kepler light curves")
+            # Limit to avoid long startup
+            pairs = [
+                (target, mission)
+                for mission, targets in self.targets_by_mission.items()
+                for target in targets[:10]
+            ]
+            
+            # All TESS and Kepler downloads overlap, bounded so MAST isn't flooded
+            semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_DOWNLOADS)
+            
+            async def download(target: str, mission: str):
+                async with semaphore:
+                    return await data_extractor.extract_lightcurve(target, mission)
+            
+            results = await asyncio.gather(*[download(t, m) for t, m in pairs], return_exceptions=True)
+            
+            # Report per-target failures without aborting the others
+            downloaded = dict.fromkeys(self.targets_by_mission, 0)
+            for (target, mission), result in zip(pairs, results):
+                if isinstance(result, Exception):
+                    logger.warning(f"Failed to download {mission} light curve for {target}: {str(result)}")
+                else:
+                    downloaded[mission] += 1
+            
+            for mission, count in downloaded.items():
+                logger.info(f"Downloaded {count} {mission} light curves")
             
         except Exception as e:
             logger.error(f"Failed to download popular light curves: {str(e)}")
@@ -133,16 +169,29 @@ class DataStartupService:
         """Check if data initialization is complete"""
         return self.startup_complete
     
+    def _refresh_status_cache(self) -> dict:
+        """Scan the data directory and cache what it holds"""
+        data_dir = Path("data")
+        
+        # os.scandir reads names only, without building a Path per entry like glob
+        files = {
+            "catalog_exists": (data_dir / "processed" / "exoplanets_catalog.csv").exists(),
+            "tess_lightcurves": _count_files(data_dir / "raw" / "tess", ".csv"),
+            "kepler_lightcurves": _count_files(data_dir / "raw" / "kepler", ".csv"),
+            "mission_summaries": _count_files(data_dir / "processed", "_summary.json")
+        }
+        self._status_cache["files"] = files
+        return files
+    
     async def get_initialization_status(self) -> dict:
         """Get detailed status of data initialization"""
-        data_dir = Path("data")
+        files = self._status_cache.get("files")
+        if files is None:
+            files = self._refresh_status_cache()
         
         status = {
             "startup_complete": self.startup_complete,
-            "catalog_exists": (data_dir / "processed" / "exoplanets_catalog.csv").exists(),
-            "tess_lightcurves": len(list((data_dir / "raw" / "tess").glob("*.csv"))) if (data_dir / "raw" / "tess").exists() else 0,
-            "kepler_lightcurves": len(list((data_dir / "raw" / "kepler").glob("*.csv"))) if (data_dir / "raw" / "kepler").exists() else 0,
-            "mission_summaries": len(list((data_dir / "processed").glob("*_summary.json"))) if (data_dir / "processed").exists() else 0
+            **files
         }
         
         return status
@@ -165,6 +214,7 @@ class DataStartupService:
             await self._create_mission_summaries()
             
             self.startup_complete = True
+            self._refresh_status_cache()
             logger.info("Force refresh completed successfully")
             return True
             
@@ -6,6 +6,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import logging
 import asyncio
+import importlib.util
+from contextlib import asynccontextmanager, suppress
 
 from app.config import settings
 from app.api.routes import missions, stars, planets, lightcurves, ml, websockets
@@ -16,13 +18,52 @@ from app.etl.startup import initialize_startup_data
 logging.basicConfig(level=getattr(logging, settings.log_level))
 logger = logging.getLogger(__name__)
 
+async def initialize_startup_data_background():
+    """Initialize data in background to avoid blocking startup"""
+    try:
+        logger.info("📡 Initializing NASA datasets...")
+        success = await initialize_startup_data()
+        if success:
+            logger.info("✅ NASA datasets initialized successfully")
+        else:
+            logger.warning("⚠️ Some datasets failed to initialize (using fallback data)")
+    except Exception as e:
+        logger.error(f"❌ Data initialization failed: {str(e)}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Server startup and shutdown
+
+    The data initialization runs as a task alongside the server; on shutdown
+    it is cancelled and awaited, so in-flight downloads don't outlive the app.
+    """
+    logger.info("🚀 Starting Exoplanet Explorer API...")
+    init_task = None
+    if settings.startup_data_init:
+        init_task = asyncio.create_task(initialize_startup_data_background())
+    else:
+        # Disabled by default so the server starts instantly (chat debugging)
+        logger.info("📊 Data initialization DISABLED (set STARTUP_DATA_INIT=true to enable)")
+    
+    try:
+        yield
+    finally:
+        if init_task is not None:
+            init_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await init_task
+
+
 # Create FastAPI application
 app = FastAPI(
     title="Exoplanet Explorer API",
     description="NASA Space Apps Challenge - Exoplanet data analysis and visualization API",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -46,32 +87,6 @@ app.include_router(websockets.router, prefix="/api/v1/ws", tags=["websockets"])
 app.include_router(websocket_chat_router.router, prefix="/api/v1", tags=["chat"])
 
 
-# MODIFICACIÓN PARA DEBUGGING: Carga inicial de datos DESHABILITADA
-# Esto permite que el servidor inicie instantáneamente sin procesos pesados
-@app.on_event("startup")
-async def startup_event():
-    """Initialize server without heavy data loading (DEBUGGING MODE)"""
-    logger.info("🚀 Starting Exoplanet Explorer API (CHAT DEBUG MODE)...")
-    logger.info("📊 Data initialization DISABLED for chat testing")
-    
-    # COMENTADO: Start data initialization in background
-    # asyncio.create_task(initialize_startup_data_background())
-
-
-# COMENTADO: Función de carga de datos deshabilitada para debugging
-# async def initialize_startup_data_background():
-#     """Initialize data in background to avoid blocking startup"""
-#     try:
-#         logger.info("📡 Initializing NASA datasets...")
-#         success = await initialize_startup_data()
-#         if success:
-#             logger.info("✅ NASA datasets initialized successfully")
-#         else:
-#             logger.warning("⚠️ Some datasets failed to initialize (using fallback data)")
-#     except Exception as e:
-#         logger.error(f"❌ Data initialization failed: {str(e)}")
-
-
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -95,6 +110,17 @@ async def data_status():
     return await get_data_status()
 
 
+def uvicorn_server_options() -> dict:
+    """
+    Event loop and HTTP parser for uvicorn: uvloop and httptools when installed
+    (uvicorn[standard] ships both on Linux/macOS), asyncio and h11 otherwise.
+    """
+    return {
+        "loop": "uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        "http": "httptools" if importlib.util.find_spec("httptools") else "h11",
+    }
+
+
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
     """Global HTTP exception handler"""
@@ -120,5 +146,6 @@ if __name__ == "__main__":
         "main:app",
         host=settings.api_host,
         port=settings.api_port,
-        reload=settings.debug
+        reload=settings.debug,
+        **uvicorn_server_options()
     )
\ No newline at end of file
@@ -1,3 +1,6 @@
+import sys
+
+
 class post:
     def __init__(self, autor: str, titulo: str, descripcion: str, contenido: str):
         self.autor = autor
@@ -8,21 +11,15 @@ class post:
     def get_summary(self):
         return f"Post by {self.autor}: {self.titulo}"
 
-    def getAutor(self):
-        return self.autor
-    def getTitulo(self):
-        return self.titulo
-    def getDescripcion(self):
-        return self.descripcion
-    def getContenido(self):
-        return self.contenido
-
     def obtener(self):
-        print("\n================================")
-        print(f"Título: {self.titulo}")
-        print(f"Autor: {self.autor.name}")
-        print("--------------------------------")
-        print(f"Descripción: {self.descripcion}")
-        print(f"Contenido: {self.contenido}")
-        print("================================")
-    
\ No newline at end of file
+        sys.stdout.write("\n".join([
+            "",
+            "================================",
+            f"Título: {self.titulo}",
+            f"Autor: {self.autor}",
+            "--------------------------------",
+            f"Descripción: {self.descripcion}",
+            f"Contenido: {self.contenido}",
+            "================================",
+            "",
+        ]))
@@ -34,7 +34,12 @@ class StarInfo(BaseModel):
 
 
 class LightCurveData(BaseModel):
-    """Light curve data model"""
+    """
+    Light curve data model
+
+    The lightcurves route sends the service payload as is (numpy arrays written
+    by orjson); this model documents the response shape for the OpenAPI schema.
+    """
     time: List[float] = Field(..., description="Time values")
     flux: List[float] = Field(..., description="Flux values")
     flux_err: Optional[List[float]] = Field(None, description="Flux error values")
@@ -92,6 +97,21 @@ class MLClassificationRequest(BaseModel):
     model_type: str = Field("random_forest", description="Model type to use")
 
 
+class MLWebSocketMessage(BaseModel):
+    """
+    Message received on the ML WebSocket endpoint, parsed straight from the JSON text
+
+    Only the envelope is typed here: client IDs are echoed back as any JSON value,
+    and payload fields are validated by the handler that uses them, so a bad
+    `features` value doesn't reject ping or stop frames.
+    """
+    type: str = Field("unknown", description="Message type (ping, start_stream, stop_stream, classify)")
+    request_id: Any = Field("unknown", description="Client request identifier (echoed back as sent)")
+    stream_id: Any = Field(None, description="Stream identifier")
+    parameters: Any = Field(default_factory=dict, description="Streaming parameters")
+    features: Any = Field(default_factory=dict, description="Feature values for classification")
+
+
 class MLClassificationResponse(BaseModel):
     """ML classification response model"""
     prediction: str = Field(..., description="Predicted class")
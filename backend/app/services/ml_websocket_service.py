@@ -9,9 +9,13 @@ from typing import Dict, Any, Optional, List
 from fastapi import WebSocket
 
 from app.models.schemas import MLClassificationRequest, MLClassificationResponse
+from app.utils import json_utils
 
 logger = logging.getLogger(__name__)
 
+# Stream events that carry the model type; "cancelled" never did
+STREAM_EVENTS_WITH_MODEL = ("started", "completed")
+
 
 class MLWebSocketService:
     """Service for ML model predictions with WebSocket streaming support"""
@@ -312,6 +316,15 @@ class MLWebSocketService:
             duration: Total streaming duration in seconds
             feature_ranges: Value ranges for features
         """
+        # Stream constants are encoded once instead of on every frame. Client
+        # values go through the encoder, never through string substitution
+        event_templates = {
+            event: self._frame_prefix(type="stream_data", stream_id=stream_id, event=event, model_type=model_type)
+            for event in STREAM_EVENTS_WITH_MODEL
+        }
+        event_templates["cancelled"] = self._frame_prefix(type="stream_data", stream_id=stream_id, event="cancelled")
+        data_prefix = self._frame_prefix(type="stream_data", stream_id=stream_id)
+        
         try:
             from app.websockets import manager
             
@@ -319,16 +332,7 @@ class MLWebSocketService:
             end_time = start_time + duration
             
             # Send stream start notification
-            await manager.send_personal_message(
-                {
-                    "type": "stream_data",
-                    "stream_id": stream_id,
-                    "event": "started",
-                    "model_type": model_type,
-                    "timestamp": time.time()
-                },
-                websocket
-            )
+            await manager.send_raw(websocket, self._event_frame(event_templates["started"]))
             
             # Continue streaming until duration expires
             while time.time() < end_time:
@@ -338,41 +342,31 @@ class MLWebSocketService:
                     min_val, max_val = range_values
                     features[feature] = min_val + random.random() * (max_val - min_val)
                 
-                # Get prediction for these features
-                request = MLClassificationRequest(
+                # Get prediction for these features (generated values need no validation)
+                request = MLClassificationRequest.model_construct(
                     features=features,
                     model_type=model_type
                 )
                 result = await self.classify(request)
                 
-                # Create stream data message
-                stream_data = {
-                    "type": "stream_data",
-                    "stream_id": stream_id,
+                # Only the per-frame fields are serialized, the prefix is reused
+                now = time.time()
+                payload = json_utils.dumps({
                     "prediction": result.prediction,
                     "confidence": result.confidence,
                     "features": features,
-                    "timestamp": time.time(),
-                    "time_remaining": round(end_time - time.time(), 1)
-                }
+                    "timestamp": now,
+                    "time_remaining": round(end_time - now, 1)
+                })
                 
                 # Send to client
-                await manager.send_personal_message(stream_data, websocket)
+                await manager.send_raw(websocket, data_prefix + payload[1:])
                 
                 # Wait for next interval
                 await asyncio.sleep(interval)
                 
             # Send stream end notification
-            await manager.send_personal_message(
-                {
-                    "type": "stream_data",
-                    "stream_id": stream_id,
-                    "event": "completed",
-                    "model_type": model_type,
-                    "timestamp": time.time()
-                },
-                websocket
-            )
+            await manager.send_raw(websocket, self._event_frame(event_templates["completed"]))
             
         except asyncio.CancelledError:
             logger.info(f"Stream {stream_id} was cancelled")
@@ -380,15 +374,7 @@ class MLWebSocketService:
             # Notify client of cancellation if possible
             try:
                 from app.websockets import manager
-                await manager.send_personal_message(
-                    {
-                        "type": "stream_data",
-                        "stream_id": stream_id,
-                        "event": "cancelled",
-                        "timestamp": time.time()
-                    },
-                    websocket
-                )
+                await manager.send_raw(websocket, self._event_frame(event_templates["cancelled"]))
             except Exception:
                 pass
                 
@@ -418,4 +404,14 @@ class MLWebSocketService:
                 del self.active_streams[stream_id]
                 
             if websocket in self.client_streams and stream_id in self.client_streams[websocket]:
-                self.client_streams[websocket].remove(stream_id)
\ No newline at end of file
+                self.client_streams[websocket].remove(stream_id)
+    
+    @staticmethod
+    def _frame_prefix(**fields) -> str:
+        """Encode the leading fields of a frame as an open JSON object ending in a comma"""
+        return json_utils.dumps(fields)[:-1] + ","
+    
+    @staticmethod
+    def _event_frame(event_prefix: str) -> str:
+        """Complete a pre-encoded stream event frame with the current time"""
+        return f'{event_prefix}"timestamp":{json_utils.dumps(time.time())}}}'
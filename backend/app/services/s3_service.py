@@ -214,7 +214,8 @@ def guardar_log(log_data: str, bucket: str = "exo-nasa", log_prefix: str = "logs
     """
     # Importar el cliente configurado
     try:
-        from app.config import s3_client
+        from app.config import get_s3_client
+        s3_client = get_s3_client()
     except ImportError:
         logger.error("Error: No se pudo importar el cliente S3 desde app.config")
         return False
@@ -0,0 +1,38 @@
+"""
+Fast JSON helpers for the WebSocket hot paths.
+
+Uses orjson when it is installed and falls back to the standard library otherwise.
+"""
+import json
+from typing import Any
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+if ORJSON_AVAILABLE:
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError, so either catches both
+    JSONDecodeError = orjson.JSONDecodeError
+
+    # Keep the stdlib behaviour for non-string keys and accept numpy values from the models
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def loads(data: Any) -> Any:
+        """Parse a JSON document from str or bytes"""
+        return orjson.loads(data)
+
+    def dumps(obj: Any) -> str:
+        """Serialize to a JSON string (clients parse text frames)"""
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS).decode("utf-8")
+else:
+    JSONDecodeError = json.JSONDecodeError
+
+    def loads(data: Any) -> Any:
+        """Parse a JSON document from str or bytes"""
+        return json.loads(data)
+
+    def dumps(obj: Any) -> str:
+        """Serialize to a JSON string (clients parse text frames)"""
+        return json.dumps(obj)
@@ -3,12 +3,26 @@ WebSocket connection manager for handling client connections and broadcasts.
 """
 from typing import Dict, List, Any
 import asyncio
-import json
 from fastapi import WebSocket
 import logging
 
+from app.config import settings
+from app.utils import json_utils
+
 logger = logging.getLogger(__name__)
 
+# Several queued messages go out as one text frame wrapped in this envelope;
+# a lone message is sent as is
+BATCH_PREFIX = '{"type":"batch","messages":['
+BATCH_SUFFIX = ']}'
+
+# Queued after the last message of a client that disconnects: the writer
+# sends what is still pending and then stops
+_FLUSH_AND_STOP = None
+
+# Seconds flush() waits for a disconnected client's pending messages
+FLUSH_TIMEOUT_SECONDS = 5.0
+
 
 class ConnectionManager:
     """
@@ -20,6 +34,11 @@ class ConnectionManager:
             "general": [],  # General connections
             "ml_model": []  # ML model specific connections
         }
+        # Per-connection bounded outgoing queue drained by a background writer task
+        self._send_queues: Dict[WebSocket, asyncio.Queue] = {}
+        self._writers: Dict[WebSocket, asyncio.Task] = {}
+        # Writers of disconnected clients still sending their last messages
+        self._draining: Dict[WebSocket, asyncio.Task] = {}
         
     async def connect(self, websocket: WebSocket, client_type: str = "general"):
         """
@@ -34,7 +53,56 @@ class ConnectionManager:
             self.active_connections[client_type] = []
             
         self.active_connections[client_type].append(websocket)
+        if websocket not in self._send_queues:
+            queue = asyncio.Queue(maxsize=max(1, settings.ws_send_queue_size))
+            self._send_queues[websocket] = queue
+            self._writers[websocket] = asyncio.create_task(self._writer(websocket, queue))
         logger.info(f"Client connected to {client_type} group. Total connections: {len(self.active_connections[client_type])}")
+
+    async def _writer(self, websocket: WebSocket, queue: asyncio.Queue):
+        """
+        Send the queued messages of one client.
+
+        Waits for a message, then drains whatever else is already queued (up to
+        ws_send_batch_size) without blocking and sends it as a single frame, so
+        a burst of events costs one write instead of one per message. Producers
+        only enqueue, so they never wait on the socket and a slow client doesn't
+        stall broadcasts to the others.
+        """
+        batch_size = max(1, settings.ws_send_batch_size)
+        try:
+            stopping = False
+            while not stopping:
+                batch = [await queue.get()]
+                while len(batch) < batch_size and not queue.empty():
+                    batch.append(queue.get_nowait())
+                # Nothing is queued after the stop marker, so it can only be last
+                if batch[-1] is _FLUSH_AND_STOP:
+                    batch.pop()
+                    stopping = True
+                if batch:
+                    await websocket.send_text(self._coalesce(batch))
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            if self._writers.get(websocket) is asyncio.current_task():
+                logger.error(f"Error sending message to client: {str(e)}")
+                for client_type, connections in self.active_connections.items():
+                    if websocket in connections:
+                        self.disconnect(websocket, client_type)
+            else:
+                # Already disconnected: the socket may be gone before the flush
+                logger.debug(f"Could not flush messages to a disconnected client: {str(e)}")
+        finally:
+            if self._draining.get(websocket) is asyncio.current_task():
+                del self._draining[websocket]
+
+    @staticmethod
+    def _coalesce(batch: List[str]) -> str:
+        """One frame for a batch of encoded messages: the message itself, or a batch envelope"""
+        if len(batch) == 1:
+            return batch[0]
+        return BATCH_PREFIX + ",".join(batch) + BATCH_SUFFIX
     
     def disconnect(self, websocket: WebSocket, client_type: str = "general"):
         """
@@ -50,6 +118,59 @@ class ConnectionManager:
                 logger.info(f"Client disconnected from {client_type} group. Remaining connections: {len(self.active_connections[client_type])}")
             except ValueError:
                 logger.warning(f"Attempted to disconnect a client that wasn't in the {client_type} group")
+
+        # Stop the writer once the client has left every group, after it has
+        # sent what is already queued (see flush)
+        if not any(websocket in connections for connections in self.active_connections.values()):
+            queue = self._send_queues.pop(websocket, None)
+            writer = self._writers.pop(websocket, None)
+            if writer is None or writer is asyncio.current_task():
+                return
+            try:
+                queue.put_nowait(_FLUSH_AND_STOP)
+                self._draining[websocket] = writer
+            except asyncio.QueueFull:
+                # A client that filled its queue isn't reading: drop what is pending
+                writer.cancel()
+
+    async def flush(self, websocket: WebSocket, timeout: float = FLUSH_TIMEOUT_SECONDS):
+        """
+        Wait until a disconnected client's writer has sent its pending messages
+
+        Call it after disconnect() while the socket is still open; a writer that
+        doesn't finish within `timeout` seconds is cancelled.
+        """
+        writer = self._draining.get(websocket)
+        if writer is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(writer), timeout)
+        except asyncio.TimeoutError:
+            writer.cancel()
+
+    def _enqueue(self, websocket: WebSocket, queue: asyncio.Queue, message: str):
+        """
+        Queue a message for a client's writer, dropping the client if it is full
+
+        A full queue means the client has stopped reading; instead of buffering
+        without bound it is removed from every group and its socket closed.
+        """
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            logger.warning(f"Send queue full ({queue.maxsize} messages); disconnecting slow client")
+            for client_type, connections in self.active_connections.items():
+                if websocket in connections:
+                    self.disconnect(websocket, client_type)
+            asyncio.create_task(self._close_slow_client(websocket))
+
+    async def _close_slow_client(self, websocket: WebSocket):
+        """Close a dropped client's socket without failing the producer"""
+        try:
+            # 1013: try again later
+            await websocket.close(code=1013)
+        except Exception as e:
+            logger.debug(f"Error closing slow client: {str(e)}")
     
     async def send_personal_message(self, message: Any, websocket: WebSocket):
         """
@@ -60,8 +181,25 @@ class ConnectionManager:
             websocket: Target WebSocket connection
         """
         if isinstance(message, dict) or isinstance(message, list):
-            message = json.dumps(message)
-        await websocket.send_text(message)
+            message = json_utils.dumps(message)
+        await self.send_raw(websocket, message)
+    
+    async def send_raw(self, websocket: WebSocket, message: str):
+        """
+        Send an already serialized message to a specific client
+        
+        Fast path for constant replies serialized once at import time.
+        
+        Args:
+            websocket: Target WebSocket connection
+            message: JSON text to send as is
+        """
+        queue = self._send_queues.get(websocket)
+        if queue is None:
+            # Not registered through connect(): no writer, send directly
+            await websocket.send_text(message)
+        else:
+            self._enqueue(websocket, queue, message)
     
     async def broadcast(self, message: Any, client_type: str = "general"):
         """
@@ -76,10 +214,16 @@ class ConnectionManager:
             return
             
         if isinstance(message, dict) or isinstance(message, list):
-            message = json.dumps(message)
+            message = json_utils.dumps(message)
             
         disconnected = []
-        for connection in self.active_connections[client_type]:
+        # Copy: a slow client can be dropped from the group while enqueueing
+        for connection in list(self.active_connections[client_type]):
+            queue = self._send_queues.get(connection)
+            if queue is not None:
+                # Send errors are handled (and the client dropped) by its writer
+                self._enqueue(connection, queue, message)
+                continue
             try:
                 await connection.send_text(message)
             except Exception as e:
@@ -10,7 +10,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 try:
     import uvicorn
-    from app.main import app
+    from app.main import app, uvicorn_server_options
     
     print("🚀 Starting Exoplanet Explorer API...")
     print("📡 Server will start at: http://localhost:8000")
@@ -22,7 +22,8 @@ try:
         host="0.0.0.0",
         port=8000,
         reload=True,
-        log_level="info"
+        log_level="info",
+        **uvicorn_server_options()
     )
     
 except ImportError as e:
@@ -0,0 +1,341 @@
+"""
+Tests for the agent helpers (skipped when the agent dependencies are not installed)
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+AGENTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "agents")
+if AGENTS_DIR not in sys.path:
+    sys.path.insert(0, AGENTS_DIR)
+
+pytest.importorskip("langchain")
+pytest.importorskip("langchain_groq")
+pytest.importorskip("langchain_experimental")
+
+import asyncio  # noqa: E402
+
+from ideas_orchestator import LLM_response, common, generate_ideas  # noqa: E402
+from llm_exohunter import llm_exohunter, llm_tools  # noqa: E402
+
+
+class _Chunk:
+    def __init__(self, content):
+        self.content = content
+
+
+class _FakeStreamingLLM:
+    """Streams a fixed text one small piece at a time"""
+
+    def __init__(self, text, size=3):
+        self.pieces = [text[i:i + size] for i in range(0, len(text), size)]
+
+    def stream(self, messages):
+        for piece in self.pieces:
+            yield _Chunk(piece)
+
+    async def astream(self, messages):
+        for piece in self.pieces:
+            yield _Chunk(piece)
+
+
+ACTION_TEXT = (
+    "Thought: descargo la curva\n"
+    "Action:\n```json\n{\"action\": \"get_star_light_curve_to_file\", \"action_input\": {}}\n```"
+)
+
+
+def test_generation_stops_after_action_block():
+    """The stream is cut as soon as the Action's JSON block closes"""
+    text = ACTION_TEXT + "\nTexto que ya no hace falta recibir"
+    result = llm_exohunter.generar_hasta_accion(_FakeStreamingLLM(text)).invoke([])
+    assert result.count("```") == 2
+    assert "que ya no hace falta" not in result
+
+
+def test_final_answer_with_code_block_is_not_truncated():
+    """A Final Answer that documents code is received whole"""
+    text = (
+        "Final Answer: He entrenado el modelo así:\n"
+        "```python\nmodel.fit(X, y)\n```\n"
+        "y después lo he evaluado:\n```python\nmodel.score(X, y)\n```\nFin."
+    )
+    result = llm_exohunter.generar_hasta_accion(_FakeStreamingLLM(text)).invoke([])
+    assert result == text
+
+
+@pytest.mark.asyncio
+async def test_think_block_with_code_is_not_taken_as_action():
+    """A fenced block inside <think> doesn't cut the response before the Action"""
+    text = (
+        "<think>Podría usar:\n```python\nprint(1)\n```\n</think>\n"
+        + ACTION_TEXT + "\nTexto que ya no hace falta recibir"
+    )
+    result = await llm_exohunter.generar_hasta_accion(_FakeStreamingLLM(text)).ainvoke([])
+    assert "get_star_light_curve_to_file" in result
+    assert "que ya no hace falta" not in result
+
+
+@pytest.fixture
+def fresh_variations(monkeypatch):
+    """Forget the variations computed by previous tests"""
+    monkeypatch.setattr(LLM_response, "_variaciones", None)
+    monkeypatch.setattr(LLM_response, "_variaciones_lock", None)
+
+
+@pytest.mark.asyncio
+async def test_human_variations_run_concurrently_under_semaphore(monkeypatch, fresh_variations):
+    """The five rewrites are awaited together, bounded by the Groq semaphore, and computed once"""
+    state = {"calls": 0, "active": 0, "peak": 0}
+
+    async def fake_obtener(cloud, system, human, modelo, usar_cache=True):
+        state["calls"] += 1
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.01)
+        state["active"] -= 1
+        return f"variación {state['calls']}"
+
+    monkeypatch.setattr(LLM_response, "obtener_respuesta_async", fake_obtener)
+    semaforos = {"groq": asyncio.Semaphore(2)}
+
+    first, second = await asyncio.gather(
+        LLM_response.human_variations(semaforos),
+        LLM_response.human_variations(semaforos),
+    )
+
+    assert len(first) == 5
+    assert first == second
+    assert state["calls"] == 5
+    assert state["peak"] == 2
+
+
+class _RateLimited(Exception):
+    status_code = 429
+
+
+@pytest.fixture
+def fake_keys(monkeypatch):
+    """Hand out numbered keys, record penalties and skip the backoff waits"""
+    keys = iter(f"key-{i}" for i in range(100))
+    penalized = []
+    monkeypatch.setattr(common, "get_random_service_key", lambda service: (service, next(keys)))
+    monkeypatch.setattr(common, "espera_backoff", lambda intento: 0)
+    monkeypatch.setattr(common.key_manager, "penalize", lambda service, key: penalized.append(key))
+    return penalized
+
+
+@pytest.mark.asyncio
+async def test_retry_helper_rotates_keys_and_penalizes_rate_limits(fake_keys):
+    """A 429 penalizes that key and the next attempt uses a different one"""
+    used = []
+
+    async def llamada(api_key):
+        used.append(api_key)
+        if len(used) < 3:
+            raise _RateLimited("429 Too Many Requests")
+        return "ok"
+
+    assert await common.con_reintentos_async("groq", "modelo", llamada) == "ok"
+    assert used == ["key-0", "key-1", "key-2"]
+    assert fake_keys == ["key-0", "key-1"]
+
+
+def test_retry_helper_does_not_retry_permanent_errors(fake_keys):
+    """A non-transient error is raised as LLMError on the first attempt"""
+    used = []
+
+    def llamada(api_key):
+        used.append(api_key)
+        raise ValueError("modelo desconocido")
+
+    with pytest.raises(common.LLMError):
+        common.con_reintentos("groq", "modelo", llamada)
+    assert used == ["key-0"]
+    assert fake_keys == []
+
+
+@pytest.mark.asyncio
+async def test_judge_stream_stops_after_verdict_line(monkeypatch, fake_keys):
+    """The judge's answer is cut once the VEREDICTO FINAL: line is complete"""
+    text = "Análisis " * 40 + "\nVEREDICTO FINAL: idea 2\nTexto que ya no hace falta recibir"
+    monkeypatch.setattr(LLM_response, "get_chat", lambda *args: _FakeStreamingLLM(text))
+
+    result = await LLM_response.obtener_respuesta_streaming_async(
+        "googleaistudio", "system", "juicio", "modelo", usar_cache=False
+    )
+    assert "VEREDICTO FINAL: idea 2" in result
+    assert "que ya no hace falta" not in result
+
+
+@pytest.mark.asyncio
+async def test_human_variations_with_fallbacks_are_not_memoized(monkeypatch, fresh_variations):
+    """A failed rewrite falls back to the original prompt and is retried on the next call"""
+    state = {"fail": True, "calls": 0}
+
+    async def fake_obtener(cloud, system, human, modelo, usar_cache=True):
+        state["calls"] += 1
+        if state["fail"]:
+            raise LLM_response.LLMError("groq caído")
+        return "variación"
+
+    monkeypatch.setattr(LLM_response, "obtener_respuesta_async", fake_obtener)
+
+    first = await LLM_response.human_variations()
+    assert first == (LLM_response.human,) * 5
+
+    state["fail"] = False
+    second = await LLM_response.human_variations()
+    third = await LLM_response.human_variations()
+    assert second == third == ("variación",) * 5
+    assert state["calls"] == 10
+
+
+def test_dataset_tool_builds_missions_concurrently(monkeypatch):
+    """missions=[...] fans the per-mission builds out to one thread each"""
+    import threading
+
+    barrier = threading.Barrier(3, timeout=5)
+
+    def fake_build(self, mission, format="parquet"):
+        # Only returns if the three builds are running at the same time
+        barrier.wait()
+        return {"status": "success", "summary": mission}
+
+    monkeypatch.setattr(llm_tools.GetLabeledExoplanetDatasetTool, "_run_mision", fake_build)
+    result = llm_tools.GetLabeledExoplanetDatasetTool().invoke({"missions": ["TESS", "Kepler", "K2", "TESS"]})
+
+    assert result["status"] == "success"
+    assert list(result["datasets"]) == ["TESS", "Kepler", "K2"]
+
+
+def _dataset_frame(dispositions):
+    n = len(dispositions)
+    return pd.DataFrame({
+        "koi_disposition": dispositions,
+        "koi_period": [str(1.5 + i) if i % 3 else None for i in range(n)],
+        "koi_depth": [float(i) if i % 4 == 0 else None for i in range(n)],
+        "st_teff": [5000.0 + i for i in range(n)],
+        "kepid": list(range(n)),
+    })
+
+
+DATASET_CASES = {
+    "labelled": ["CONFIRMED", "CANDIDATE", "FALSE POSITIVE", None, "weird", "fp thing", "confirmed", "CANDIDATE"],
+    "no_labelled_rows": ["weird", None, "other"],
+    "empty": [],
+}
+
+
+def _build_dataset(monkeypatch, df, use_polars):
+    if use_polars:
+        if not (llm_tools.POLARS_AVAILABLE and llm_tools.PYARROW_AVAILABLE):
+            pytest.skip("polars and pyarrow are not installed")
+    else:
+        monkeypatch.setattr(llm_tools, "POLARS_AVAILABLE", False)
+    return llm_tools.GetLabeledExoplanetDatasetTool()._construir_dataset_para_ml(df.copy(), "koi_disposition")
+
+
+@pytest.mark.parametrize("case", list(DATASET_CASES))
+def test_dataset_pandas_and_polars_paths_agree(monkeypatch, case):
+    """Both dataset builders keep the same rows, columns, labels and values"""
+    df = _dataset_frame(DATASET_CASES[case])
+    with monkeypatch.context() as m:
+        X_pd, y_pd = _build_dataset(m, df, use_polars=False)
+    X_pl, y_pl = _build_dataset(monkeypatch, df, use_polars=True)
+
+    assert list(X_pl.columns) == list(X_pd.columns)
+    assert list(X_pl.index) == list(X_pd.index)
+    assert list(y_pl) == list(y_pd)
+    assert y_pl.dtype == y_pd.dtype == llm_tools.LABEL_DTYPE
+    assert np.allclose(X_pl.to_numpy(), X_pd.to_numpy())
+    if len(y_pd) == 0:
+        assert X_pd.shape == X_pl.shape == (0, 0)
+
+
+def test_scratchpad_truncates_parallel_actions_as_a_group():
+    """Older steps are dropped per LLM response, never splitting a multi-action group"""
+    from langchain_core.agents import AgentAction
+
+    def paso(tool, log):
+        return AgentAction(tool, {}, log), f"obs {tool}"
+
+    parser = llm_exohunter.MultiActionJSONOutputParser()
+    grupo_text = (
+        'Action:\n```json\n[{"action": "a", "action_input": {}}, {"action": "b", "action_input": {}},'
+        ' {"action": "c", "action_input": {}}]\n```'
+    )
+    grupo = [(action, f"obs {action.tool}") for action in parser.parse(grupo_text)]
+    steps = [paso("old", "Action: old\n")] + grupo + [paso("last", "Action: last\n")]
+
+    scratchpad = llm_exohunter.formatear_scratchpad(steps, max_pasos=2)
+
+    assert "old" not in scratchpad
+    assert scratchpad.count(grupo_text) == 1
+    for tool in ("a", "b", "c", "last"):
+        assert f"obs {tool}" in scratchpad
+
+
+@pytest.mark.asyncio
+async def test_llm_cache_is_opt_in(monkeypatch, fake_keys):
+    """Identical prompts reach the LLM again unless LLM_CACHE is set"""
+    from cache import llm_cache
+
+    calls = []
+
+    async def fake_groq(system, human, modelo, api_key):
+        calls.append(human)
+        return f"idea {len(calls)}"
+
+    monkeypatch.setattr(LLM_response, "obtener_respuesta_groq_async", fake_groq)
+    monkeypatch.setattr(LLM_response, "get_cached", lambda *args: None)
+    monkeypatch.setattr(LLM_response, "set_cached", lambda *args: calls.append("cached"))
+
+    monkeypatch.delenv(llm_cache.CACHE_ENV_VAR, raising=False)
+    first = await LLM_response.obtener_respuesta_async("groq", "s", "misma idea", "m")
+    second = await LLM_response.obtener_respuesta_async("groq", "s", "misma idea", "m")
+    assert (first, second) == ("idea 1", "idea 2")
+    assert "cached" not in calls
+
+    monkeypatch.setenv(llm_cache.CACHE_ENV_VAR, "1")
+    await LLM_response.obtener_respuesta_async("groq", "s", "misma idea", "m")
+    assert calls[-1] == "cached"
+
+
+@pytest.mark.asyncio
+async def test_tree_search_with_custom_models_dict(monkeypatch, fresh_variations):
+    """A models_dict without the judge or Groq providers still gets their semaphores"""
+    used = []
+
+    async def fake_obtener(cloud, system, human, modelo, usar_cache=None):
+        used.append(cloud)
+        return f"respuesta de {cloud}"
+
+    async def fake_streaming(cloud, system, human, modelo, **kwargs):
+        used.append(cloud)
+        return "VEREDICTO FINAL: idea 1"
+
+    monkeypatch.setattr(LLM_response, "obtener_respuesta_async", fake_obtener)
+    monkeypatch.setattr(generate_ideas, "obtener_respuesta_async", fake_obtener)
+    monkeypatch.setattr(generate_ideas, "obtener_respuesta_streaming_async", fake_streaming)
+
+    veredicto = await generate_ideas.proceso_de_metajuicio({"cerebras": ["modelo"]}, "system", 2, 1, 2)
+
+    assert veredicto == "VEREDICTO FINAL: idea 1"
+    assert set(used) == {"groq", "cerebras", generate_ideas.PROVEEDOR_JUEZ}
+
+
+def test_model_choice_follows_the_dict_passed_in(monkeypatch):
+    """Copies and in-place edits of models_dict are honoured on the next pick"""
+    from cloud.cloud_constants import models_dict
+
+    copia = {proveedor: list(modelos) for proveedor, modelos in models_dict.items()}
+    assert common.elegir_modelo_aleatorio(copia)[0] in copia
+
+    monkeypatch.setitem(models_dict, "groq", ["solo-este"])
+    for proveedor in [p for p in models_dict if p != "groq"]:
+        monkeypatch.delitem(models_dict, proveedor)
+    assert common.elegir_modelo_aleatorio(models_dict) == ("groq", "solo-este")
@@ -1,6 +1,9 @@
 """
 Basic unit tests for the API
 """
+import asyncio
+import json
+
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
@@ -75,4 +78,147 @@ def test_ml_classify():
     data = response.json()
     assert "prediction" in data
     assert "confidence" in data
-    assert "probabilities" in data
\ No newline at end of file
+    assert "probabilities" in data
+
+def test_ml_websocket_echoes_non_string_request_id():
+    """Client IDs of any JSON type are echoed back, not rejected"""
+    with client.websocket_connect("/api/v1/ws/ws/ml/random_forest") as websocket:
+        assert websocket.receive_json()["type"] == "connection"
+        websocket.send_json({"type": "classify", "request_id": 7, "features": {"period": 3.0, "radius": 1.0}})
+        data = websocket.receive_json()
+        assert data["type"] == "classification"
+        assert data["request_id"] == 7
+
+
+def test_ml_websocket_bad_features_only_affect_classify():
+    """A malformed features field doesn't reject frames that never use it"""
+    with client.websocket_connect("/api/v1/ws/ws/ml/random_forest") as websocket:
+        assert websocket.receive_json()["type"] == "connection"
+        websocket.send_json({"type": "ping", "features": "not-a-dict"})
+        assert websocket.receive_json() == {"type": "pong"}
+
+        websocket.send_json({"type": "classify", "request_id": "r1", "features": {"period": "abc"}})
+        data = websocket.receive_json()
+        assert data["type"] == "error"
+        assert data["request_id"] == "r1"
+
+
+def test_ml_websocket_invalid_json():
+    """Malformed JSON still gets the fixed error reply"""
+    with client.websocket_connect("/api/v1/ws/ws/ml/random_forest") as websocket:
+        assert websocket.receive_json()["type"] == "connection"
+        websocket.send_text("{not json")
+        assert websocket.receive_json() == {"type": "error", "message": "Invalid JSON format"}
+
+
+class _FakeWebSocket:
+    """Records frames; a stalled client never completes a send"""
+
+    def __init__(self, stalled=False):
+        self.stalled = stalled
+        self.sent = []
+        self.close_code = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        if self.stalled:
+            await asyncio.Event().wait()
+        self.sent.append(message)
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+    def received(self):
+        """Decoded messages, with batch envelopes unpacked"""
+        messages = []
+        for frame in self.sent:
+            data = json.loads(frame)
+            messages.extend(data["messages"] if data.get("type") == "batch" else [data])
+        return messages
+
+
+@pytest.mark.asyncio
+async def test_broadcast_drops_client_with_full_send_queue(monkeypatch):
+    """A client that stops reading is disconnected once its bounded queue fills"""
+    from app.config import settings
+    from app.websockets.connection_manager import ConnectionManager
+
+    monkeypatch.setattr(settings, "ws_send_queue_size", 3)
+    manager = ConnectionManager()
+    slow, fast = _FakeWebSocket(stalled=True), _FakeWebSocket()
+    await manager.connect(slow)
+    await manager.connect(fast)
+
+    for i in range(6):
+        await manager.broadcast({"n": i})
+        await asyncio.sleep(0)
+    await asyncio.sleep(0.01)
+
+    assert manager.active_connections["general"] == [fast]
+    assert slow not in manager._send_queues
+    assert slow.close_code == 1013
+    assert [m["n"] for m in fast.received()] == list(range(6))
+    manager.disconnect(fast)
+
+
+@pytest.mark.asyncio
+async def test_writer_coalesces_queued_messages_into_one_frame(monkeypatch):
+    """Messages queued before the writer runs go out as one batch frame, up to ws_send_batch_size"""
+    from app.config import settings
+    from app.websockets.connection_manager import ConnectionManager
+
+    monkeypatch.setattr(settings, "ws_send_batch_size", 3)
+    manager = ConnectionManager()
+    websocket = _FakeWebSocket()
+    await manager.connect(websocket)
+
+    for i in range(4):
+        await manager.send_personal_message({"n": i}, websocket)
+    await asyncio.sleep(0.01)
+
+    assert len(websocket.sent) == 2
+    assert json.loads(websocket.sent[0]) == {"type": "batch", "messages": [{"n": 0}, {"n": 1}, {"n": 2}]}
+    assert json.loads(websocket.sent[1]) == {"n": 3}
+    manager.disconnect(websocket)
+
+
+@pytest.mark.asyncio
+async def test_disconnect_flushes_pending_messages():
+    """Messages queued before disconnect() are still sent, then the writer stops"""
+    from app.websockets.connection_manager import ConnectionManager
+
+    manager = ConnectionManager()
+    websocket = _FakeWebSocket()
+    await manager.connect(websocket)
+
+    await manager.send_personal_message({"event": "cancelled"}, websocket)
+    manager.disconnect(websocket)
+    await manager.flush(websocket)
+
+    assert websocket.received() == [{"event": "cancelled"}]
+    assert websocket not in manager._draining
+
+
+def test_startup_data_init_is_cancelled_on_shutdown(monkeypatch):
+    """A slow startup initialization doesn't keep the app from shutting down"""
+    import app.main as main_module
+    from app.config import settings
+
+    state = {"started": False, "cancelled": False}
+
+    async def slow_init():
+        state["started"] = True
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+
+    monkeypatch.setattr(settings, "startup_data_init", True)
+    monkeypatch.setattr(main_module, "initialize_startup_data", slow_init)
+
+    with TestClient(app) as lifespan_client:
+        assert lifespan_client.get("/health").status_code == 200
+    assert state == {"started": True, "cancelled": True}
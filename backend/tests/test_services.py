@@ -37,4 +37,168 @@ async def test_lightkurve_service_download():
     assert "star_id" in lc_data
     assert "data" in lc_data
     assert "time" in lc_data["data"]
-    assert "flux" in lc_data["data"]
\ No newline at end of file
+    assert "flux" in lc_data["data"]
+
+def _install_fake_search(monkeypatch, products):
+    """Make lightkurve.search_lightcurve return fake products with download() delays
+
+    A product given as an exception instance raises it from download().
+    """
+    import time
+    import lightkurve as lk
+    import app.services.lightkurve_service as service_module
+
+    class FakeProduct:
+        def __init__(self, index):
+            self.index = index
+
+        def download(self, quality_bitmask=None):
+            delay, lc = products[self.index]
+            time.sleep(delay)
+            if isinstance(lc, Exception):
+                raise lc
+            return lc
+
+    class FakeSearchResult:
+        def __len__(self):
+            return len(products)
+
+        def __getitem__(self, index):
+            return FakeProduct(index)
+
+    monkeypatch.setattr(lk, "search_lightcurve", lambda *args, **kwargs: FakeSearchResult())
+    monkeypatch.setattr(service_module, "_disk_cache_get", lambda key: None)
+    monkeypatch.setattr(service_module, "_disk_cache_set", lambda key, value: None)
+
+
+def _fake_lightcurve(start, n_points=720, cadence_days=20 / 86400):
+    """TESS-like 20 s cadence segment at BTJD-sized times"""
+    import numpy as np
+    import lightkurve as lk
+    time_values = start + np.arange(n_points) * cadence_days
+    return lk.LightCurve(time=time_values, flux=np.ones(n_points), flux_err=np.full(n_points, 1e-3))
+
+
+def test_lightkurve_download_keeps_float64_time(monkeypatch):
+    """Time keeps its precision at BTJD ~2500 d; only flux is stored as float32"""
+    import numpy as np
+    _install_fake_search(monkeypatch, [(0.0, _fake_lightcurve(2500.0))])
+
+    result = lightkurve_service._download_lightcurve_sync("TIC 1", "TESS", False, False)
+
+    time_data = result["data"]["time"]
+    assert time_data.dtype == np.float64
+    assert result["data"]["flux"].dtype == np.float32
+    # No duplicated timestamps from float32 rounding at 20 s cadence
+    assert len(np.unique(time_data)) == len(time_data)
+    assert np.allclose(np.diff(time_data), 20 / 86400, rtol=0, atol=1e-8)
+
+
+def test_lightkurve_mock_lightcurve_dtypes():
+    """The mock light curve mirrors the real dtypes"""
+    import numpy as np
+    lc_data = lightkurve_service._get_mock_lightcurve("TOI-700", "TESS")
+    assert lc_data["data"]["time"].dtype == np.float64
+    assert lc_data["data"]["flux"].dtype == np.float32
+    assert lc_data["data"]["flux_err"].dtype == np.float32
+
+
+def _install_fake_missions(monkeypatch, missions):
+    """Make _search_mission_sync answer per mission after a delay: {mission: (delay, has_match)}"""
+    import time
+    from types import SimpleNamespace
+
+    def search(query, mission):
+        delay, has_match = missions[mission]
+        time.sleep(delay)
+        return [SimpleNamespace(target_name=f"{mission} {query}")] if has_match else []
+
+    monkeypatch.setattr(lightkurve_service, "_search_mission_sync", search)
+
+
+@pytest.mark.asyncio
+async def test_first_match_prefers_higher_priority_mission(monkeypatch):
+    """A fast K2 hit waits for the slower Kepler search, which outranks it"""
+    _install_fake_missions(monkeypatch, {
+        "TESS": (0.10, False),
+        "Kepler": (0.15, True),
+        "K2": (0.0, True),
+    })
+    target = await lightkurve_service.first_match("priority-kepler")
+    assert target["mission"] == "KEPLER"
+
+
+@pytest.mark.asyncio
+async def test_first_match_defaults_to_tess(monkeypatch):
+    """When every mission matches, TESS wins even if it answers last"""
+    _install_fake_missions(monkeypatch, {
+        "TESS": (0.15, True),
+        "Kepler": (0.0, True),
+        "K2": (0.0, True),
+    })
+    target = await lightkurve_service.first_match("priority-tess")
+    assert target["mission"] == "TESS"
+
+
+class _RecordingWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, message):
+        self.sent.append(message)
+
+
+@pytest.mark.asyncio
+async def test_ml_stream_frames_keep_baseline_payloads():
+    """Stream frames stay valid JSON for any client IDs; "cancelled" carries no model_type"""
+    import json
+    from app.services.ml_websocket_service import MLWebSocketService
+
+    service = MLWebSocketService()
+    websocket = _RecordingWebSocket()
+    stream_id = 'id "__STREAM_ID__" \\ ñ'
+    model_type = "__STREAM_ID__"
+
+    await service.start_streaming(websocket, model_type, stream_id, {"interval": 0.01, "duration": 5})
+    await asyncio.sleep(0.05)
+    assert await service.stop_stream(stream_id, websocket)
+
+    frames = [json.loads(message) for message in websocket.sent]
+    assert all(frame["stream_id"] == stream_id for frame in frames)
+    started, cancelled = frames[0], frames[-1]
+    assert started["event"] == "started" and started["model_type"] == model_type
+    assert set(cancelled) == {"type", "stream_id", "event", "timestamp"}
+    assert cancelled["event"] == "cancelled"
+
+
+def test_parallel_download_keeps_product_order(monkeypatch):
+    """Products finishing out of order are still stitched in search-result order"""
+    import numpy as np
+    segment_days = 720 * 20 / 86400
+    starts = [2500.0 + i * (segment_days + 1.0) for i in range(3)]
+    # The first sector finishes last and the last one first
+    _install_fake_search(monkeypatch, [
+        (0.15, _fake_lightcurve(starts[0])),
+        (0.05, _fake_lightcurve(starts[1])),
+        (0.0, _fake_lightcurve(starts[2])),
+    ])
+
+    result = lightkurve_service._download_lightcurve_sync("TIC 2", "TESS", False, False)
+
+    time_data = result["data"]["time"]
+    assert len(time_data) == 3 * 720
+    assert np.all(np.diff(time_data) > 0)
+    assert np.isclose(time_data[0], starts[0]) and np.isclose(time_data[720], starts[1])
+
+
+def test_parallel_download_skips_failed_products(monkeypatch):
+    """One failing sector doesn't discard the ones that downloaded"""
+    _install_fake_search(monkeypatch, [
+        (0.0, _fake_lightcurve(2500.0)),
+        (0.0, OSError("corrupt FITS")),
+        (0.0, _fake_lightcurve(2510.0)),
+    ])
+
+    result = lightkurve_service._download_lightcurve_sync("TIC 3", "TESS", False, False)
+
+    assert len(result["data"]["time"]) == 2 * 720